@@ -0,0 +1,74 @@
+"""
+Background artifact writer for Compliance Agent
+Flushes non-critical blob uploads and Cosmos inserts from a worker thread
+"""
+import sys
+from pathlib import Path
+
+# Add the src directory to Python path
+current_dir = Path(__file__).parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from concurrent.futures import Future
+from typing import Any, Callable, Iterable, List
+import asyncio
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+class ArtifactWriteError(Exception):
+    """Raised by flush() when one or more of the awaited buffered writes failed"""
+    
+    def __init__(self, errors: List[BaseException]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} buffered write(s) failed; first error: {errors[0]}")
+
+class AsyncArtifactWriter:
+    """Runs blocking persistence calls on a single daemon thread, off the event loop"""
+    
+    def __init__(self):
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def _ensure_worker(self):
+        """Start the worker thread on first use"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+                self._thread.start()
+    
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue a blocking write; returns at once with a future for its outcome"""
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+    
+    def _run(self):
+        """Worker loop - a failed write is recorded on its future and never stops the queue"""
+        while True:
+            future, fn, args, kwargs = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                logger.error(f"Buffered write {getattr(fn, '__qualname__', fn)} failed: {e}")
+                future.set_exception(e)
+    
+    async def flush(self, futures: Iterable[Future]) -> None:
+        """Wait for the given queued writes (only the caller's own) and raise if any failed"""
+        futures = list(futures)
+        if not futures:
+            return
+        results = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise ArtifactWriteError(errors)
+
+# Global instance
+artifact_writer = AsyncArtifactWriter()
@@ -43,6 +43,13 @@ class ComplianceConfig:
         self.default_risk_threshold = float(os.getenv("DEFAULT_RISK_THRESHOLD", "0.7"))
         self.supported_frameworks = os.getenv("COMPLIANCE_FRAMEWORKS", "GDPR,SOX,HIPAA,PCI-DSS,SOC2").split(",")
         
+        # Performance settings
+        self.llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", "3600"))  # seconds, 0 disables
+        self.max_parallel_llm = int(os.getenv("MAX_PARALLEL_LLM", "5"))  # concurrent LLM calls per node
+        self.doc_render_workers = int(os.getenv("DOC_RENDER_WORKERS", "4"))  # threads rendering DOCX/PDF files
+        self.doc_render_processes = int(os.getenv("DOC_RENDER_PROCESSES", "0"))  # render processes, 0 renders in threads
+        self.llm_call_timeout = float(os.getenv("LLM_CALL_TIMEOUT", "120"))  # seconds per document generation
+        
         # Configure logging
         self._configure_logging()
         
@@ -171,6 +171,7 @@ class DocumentGenerator:
             leftMargin=72,
             topMargin=72,
             bottomMargin=18,
+            pageCompression=1,  # zlib page streams regardless of rl_config
         )
         
         # Container for the 'Flowable' objects
@@ -404,9 +405,10 @@ class DocumentGenerator:
         
         output_path = self.output_dir / f"{base_filename}.json"
         
-        # Write formatted JSON
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(content, f, indent=2, ensure_ascii=False, default=str)
+        # Serialize in memory, then write once through a 1 MiB buffer
+        data = json.dumps(content, indent=2, ensure_ascii=False, default=str)
+        with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write(data)
         
         return output_path
 
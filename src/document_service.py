@@ -5,36 +5,21 @@ Based on the working implementation from deep-research-agent
 """
 import io
 import asyncio
+import importlib.util
 import base64
-from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Sequence
 from datetime import datetime
 import logging
 from pathlib import Path
 
-# DOCX generation
-try:
-    from docx import Document
-    from docx.shared import Pt, Inches, RGBColor
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.oxml import OxmlElement
-    from docx.oxml.ns import qn
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
+# DOCX and PDF libraries are imported on first use; only their presence is checked at load
+DOCX_AVAILABLE = importlib.util.find_spec("docx") is not None
+if not DOCX_AVAILABLE:
     logging.warning("python-docx not installed. DOCX generation disabled.")
 
-# PDF generation
-try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_LEFT
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-    from reportlab.platypus import Table, TableStyle
-    from reportlab.lib import colors
-    PDF_SUPPORT = True
-except ImportError:
-    PDF_SUPPORT = False
+PDF_SUPPORT = importlib.util.find_spec("reportlab") is not None
+if not PDF_SUPPORT:
     logging.warning("ReportLab not installed. PDF generation disabled.")
 
 # Excel generation
@@ -43,13 +28,86 @@ try:
     from openpyxl import Workbook
     from openpyxl.styles import Font, Fill, PatternFill, Alignment, Border, Side
     from openpyxl.utils import get_column_letter
+    from openpyxl.cell import WriteOnlyCell
+    BOLD_FONT = Font(bold=True)
+    TITLE_FONT = Font(bold=True, size=14)
     EXCEL_AVAILABLE = True
 except ImportError:
     EXCEL_AVAILABLE = False
     logging.warning("openpyxl not installed. Excel generation disabled.")
 
+# Async file I/O (optional - falls back to a worker thread)
+try:
+    import aiofiles
+    AIOFILES_AVAILABLE = True
+except ImportError:
+    AIOFILES_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Payloads above this size are written in chunks so other tasks can run between them
+_ASYNC_WRITE_THRESHOLD = 16 << 20
+_ASYNC_WRITE_CHUNK = 4 << 20
+
+# Static sample rows for the Excel templates - built once at import
+_DPIA_OVERVIEW_ROWS = (
+    ("",),
+    ("Section", "Status", "Comments"),
+    ("1. Processing Description", "Complete", "Detailed in main document"),
+    ("2. Necessity Assessment", "Complete", "Justified per legal basis"),
+    ("3. Risk Identification", "Complete", "See Risk Assessment tab"),
+    ("4. Mitigation Measures", "Complete", "See Mitigation tab"),
+    ("5. Consultation", "Pending", "If high risk remains"),
+    ("6. Review Schedule", "Annual", "Next review in 12 months")
+)
+
+_DPIA_RISK_HEADERS = ("Risk ID", "Risk Description", "Likelihood", "Impact", "Risk Level", "Mitigation Required")
+
+_DPIA_RISK_ROWS = (
+    ("RISK-001", "Unauthorized access to personal data", "Medium", "High", "High", "Yes"),
+    ("RISK-002", "Data breach during transfer", "Low", "High", "Medium", "Yes"),
+    ("RISK-003", "Excessive data retention", "Low", "Medium", "Low", "Yes"),
+    ("RISK-004", "Third-party processor breach", "Medium", "High", "High", "Yes")
+)
+
+_CHECKLIST_HEADERS = ("Category", "Requirement", "Status", "Evidence", "Owner", "Due Date")
+
+_CHECKLIST_ROWS = (
+    ("Data Protection", "Privacy Policy Published", "Complete", "Website URL", "Legal Team", "Completed"),
+    ("Data Protection", "DPIA Conducted", "In Progress", "DPIA Document", "DPO", "2024-Q1"),
+    ("Security", "Access Controls Implemented", "Complete", "IAM Policy", "IT Security", "Completed"),
+    ("Security", "Encryption at Rest", "Complete", "Technical Spec", "IT Security", "Completed"),
+    ("Governance", "DPO Appointed", "Complete", "Appointment Letter", "Board", "Completed"),
+    ("Training", "Staff Training Completed", "In Progress", "Training Records", "HR", "2024-Q1")
+)
+
+_VENDOR_HEADERS = ("Vendor Name", "Service Type", "Data Processed", "Risk Level", "Contract Status", "Assessment Date", "Next Review")
+
+_VENDOR_ROWS = (
+    ("Cloud Provider A", "Infrastructure", "All customer data", "High", "Signed", "2024-01-01", "2024-07-01"),
+    ("Payment Processor B", "Payments", "Payment data", "High", "Signed", "2024-01-01", "2024-07-01"),
+    ("Email Service C", "Communications", "Email addresses", "Medium", "Under Review", "2024-02-01", "2024-08-01")
+)
+
+_TRAINING_OVERVIEW_ROWS = (
+    ("",),
+    ("Module", "Duration", "Target Audience", "Status"),
+    ("Introduction to Compliance", "1 hour", "All Staff", "Available"),
+    ("Data Protection Basics", "2 hours", "All Staff", "Available"),
+    ("Security Best Practices", "1.5 hours", "Technical Staff", "In Development"),
+    ("Incident Response", "1 hour", "Management", "In Development")
+)
+
+@dataclass
+class SheetSpec:
+    """Layout of a single worksheet written by ComplianceDocumentService._build_xlsx"""
+    title: str
+    title_row: Optional[str] = None
+    headers: Sequence[str] = ()
+    rows: Sequence[Sequence[Any]] = ()
+    header_fill: Optional[str] = None
+    merge_title: bool = False
+
 class ComplianceDocumentService:
     """Service for creating compliance documents in various formats"""
     
@@ -132,6 +190,12 @@ class ComplianceDocumentService:
         if not DOCX_AVAILABLE:
             raise ImportError("python-docx not installed")
         
+        from docx import Document
+        from docx.shared import Pt
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        from docx.oxml import OxmlElement
+        from docx.oxml.ns import qn
+        
         doc = Document()
         
         # Set document properties
@@ -295,6 +359,13 @@ class ComplianceDocumentService:
     ) -> Path:
         """Synchronous PDF creation (runs in thread pool)"""
         
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+        
         try:
             output_path = self.output_dir / f"{base_filename}.pdf"
             
@@ -305,7 +376,8 @@ class ComplianceDocumentService:
                 rightMargin=72,
                 leftMargin=72,
                 topMargin=72,
-                bottomMargin=72
+                bottomMargin=72,
+                pageCompression=1  # zlib page streams regardless of rl_config
             )
             
             # Container for the 'Flowable' objects
@@ -622,80 +694,23 @@ class ComplianceDocumentService:
     ) -> Path:
         """Synchronous DPIA Excel creation"""
         
-        wb = Workbook()
+        # Only the header rows vary per call
+        overview_data = (
+            ("DPIA - Data Protection Impact Assessment",),
+            (f"Organization: {company_name}",),
+            (f"Date: {datetime.utcnow().strftime('%Y-%m-%d')}",),
+            (f"Framework: {framework.upper()}",),
+            *_DPIA_OVERVIEW_ROWS
+        )
         
         # Create multiple sheets for DPIA sections
-        sheets = {
-            "Overview": wb.active,
-            "Risk Assessment": wb.create_sheet("Risk Assessment"),
-            "Mitigation Measures": wb.create_sheet("Mitigation Measures"),
-            "Compliance Checklist": wb.create_sheet("Compliance Checklist")
-        }
-        
-        # Overview Sheet
-        ws = sheets["Overview"]
-        ws.title = "Overview"
-        
-        # Add headers and content
-        overview_data = [
-            ["DPIA - Data Protection Impact Assessment"],
-            [f"Organization: {company_name}"],
-            [f"Date: {datetime.utcnow().strftime('%Y-%m-%d')}"],
-            [f"Framework: {framework.upper()}"],
-            [""],
-            ["Section", "Status", "Comments"],
-            ["1. Processing Description", "Complete", "Detailed in main document"],
-            ["2. Necessity Assessment", "Complete", "Justified per legal basis"],
-            ["3. Risk Identification", "Complete", "See Risk Assessment tab"],
-            ["4. Mitigation Measures", "Complete", "See Mitigation tab"],
-            ["5. Consultation", "Pending", "If high risk remains"],
-            ["6. Review Schedule", "Annual", "Next review in 12 months"]
-        ]
-        
-        for row_idx, row_data in enumerate(overview_data, 1):
-            for col_idx, value in enumerate(row_data, 1):
-                ws.cell(row=row_idx, column=col_idx, value=value)
-        
-        # Risk Assessment Sheet
-        ws = sheets["Risk Assessment"]
-        risk_headers = ["Risk ID", "Risk Description", "Likelihood", "Impact", "Risk Level", "Mitigation Required"]
-        
-        for col, header in enumerate(risk_headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-        
-        # Sample risk data
-        risks = [
-            ["RISK-001", "Unauthorized access to personal data", "Medium", "High", "High", "Yes"],
-            ["RISK-002", "Data breach during transfer", "Low", "High", "Medium", "Yes"],
-            ["RISK-003", "Excessive data retention", "Low", "Medium", "Low", "Yes"],
-            ["RISK-004", "Third-party processor breach", "Medium", "High", "High", "Yes"]
+        specs = [
+            SheetSpec("Overview", rows=overview_data),
+            SheetSpec("Risk Assessment", headers=_DPIA_RISK_HEADERS, rows=_DPIA_RISK_ROWS),
+            SheetSpec("Mitigation Measures"),
+            SheetSpec("Compliance Checklist")
         ]
-        
-        for row_idx, risk_data in enumerate(risks, 2):
-            for col_idx, value in enumerate(risk_data, 1):
-                ws.cell(row=row_idx, column=col_idx, value=value)
-        
-        # Adjust column widths for all sheets
-        for sheet_name, sheet in sheets.items():
-            for column in sheet.columns:
-                max_length = 0
-                column = [cell for cell in column]
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                if adjusted_width > 0:
-                    sheet.column_dimensions[column[0].column_letter].width = adjusted_width
-        
-        # Save workbook
-        output_path = self.output_dir / f"{base_filename}.xlsx"
-        wb.save(str(output_path))
-        
-        return output_path
+        return self._build_xlsx(self.output_dir / f"{base_filename}.xlsx", specs, max_width=50)
     
     async def create_compliance_checklist_excel(
         self,
@@ -724,55 +739,18 @@ class ComplianceDocumentService:
     ) -> Path:
         """Synchronous Compliance Checklist Excel creation"""
         
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Compliance Checklist"
-        
-        # Add header
-        ws['A1'] = f"{company_name} - {framework.upper()} Compliance Checklist"
-        ws['A1'].font = Font(bold=True, size=14)
-        ws.merge_cells('A1:F1')
-        
-        # Checklist headers
-        headers = ["Category", "Requirement", "Status", "Evidence", "Owner", "Due Date"]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-        
         # Sample checklist items (could extract from content)
-        checklist_items = [
-            ["Data Protection", "Privacy Policy Published", "Complete", "Website URL", "Legal Team", "Completed"],
-            ["Data Protection", "DPIA Conducted", "In Progress", "DPIA Document", "DPO", "2024-Q1"],
-            ["Security", "Access Controls Implemented", "Complete", "IAM Policy", "IT Security", "Completed"],
-            ["Security", "Encryption at Rest", "Complete", "Technical Spec", "IT Security", "Completed"],
-            ["Governance", "DPO Appointed", "Complete", "Appointment Letter", "Board", "Completed"],
-            ["Training", "Staff Training Completed", "In Progress", "Training Records", "HR", "2024-Q1"]
+        specs = [
+            SheetSpec(
+                "Compliance Checklist",
+                title_row=f"{company_name} - {framework.upper()} Compliance Checklist",
+                headers=_CHECKLIST_HEADERS,
+                rows=_CHECKLIST_ROWS,
+                header_fill="D3D3D3",
+                merge_title=True
+            )
         ]
-        
-        for row_idx, item in enumerate(checklist_items, 4):
-            for col_idx, value in enumerate(item, 1):
-                ws.cell(row=row_idx, column=col_idx, value=value)
-        
-        # Auto-adjust columns
-        for column in ws.columns:
-            max_length = 0
-            column = [cell for cell in column]
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 40)
-            if adjusted_width > 0:
-                ws.column_dimensions[column[0].column_letter].width = adjusted_width
-        
-        # Save workbook
-        output_path = self.output_dir / f"{base_filename}.xlsx"
-        wb.save(str(output_path))
-        
-        return output_path
+        return self._build_xlsx(self.output_dir / f"{base_filename}.xlsx", specs)
     
     async def create_vendor_assessment_excel(
         self,
@@ -801,48 +779,16 @@ class ComplianceDocumentService:
     ) -> Path:
         """Synchronous Vendor Assessment Excel creation"""
         
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Vendor Assessment"
-        
-        # Add assessment criteria
-        ws['A1'] = f"{company_name} - Vendor/Processor Assessment"
-        ws['A1'].font = Font(bold=True, size=14)
-        
-        headers = ["Vendor Name", "Service Type", "Data Processed", "Risk Level", "Contract Status", "Assessment Date", "Next Review"]
-        for col, header in enumerate(headers, 1):
-            ws.cell(row=3, column=col, value=header).font = Font(bold=True)
-        
         # Sample vendor data
-        vendors = [
-            ["Cloud Provider A", "Infrastructure", "All customer data", "High", "Signed", "2024-01-01", "2024-07-01"],
-            ["Payment Processor B", "Payments", "Payment data", "High", "Signed", "2024-01-01", "2024-07-01"],
-            ["Email Service C", "Communications", "Email addresses", "Medium", "Under Review", "2024-02-01", "2024-08-01"]
+        specs = [
+            SheetSpec(
+                "Vendor Assessment",
+                title_row=f"{company_name} - Vendor/Processor Assessment",
+                headers=_VENDOR_HEADERS,
+                rows=_VENDOR_ROWS
+            )
         ]
-        
-        for row_idx, vendor in enumerate(vendors, 4):
-            for col_idx, value in enumerate(vendor, 1):
-                ws.cell(row=row_idx, column=col_idx, value=value)
-        
-        # Auto-adjust columns
-        for column in ws.columns:
-            max_length = 0
-            column = [cell for cell in column]
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 40)
-            if adjusted_width > 0:
-                ws.column_dimensions[column[0].column_letter].width = adjusted_width
-        
-        # Save workbook
-        output_path = self.output_dir / f"{base_filename}.xlsx"
-        wb.save(str(output_path))
-        
-        return output_path
+        return self._build_xlsx(self.output_dir / f"{base_filename}.xlsx", specs)
     
     async def create_training_materials_excel(
         self,
@@ -871,52 +817,64 @@ class ComplianceDocumentService:
     ) -> Path:
         """Synchronous Training Materials Excel creation"""
         
-        wb = Workbook()
+        # Only the header rows vary per call
+        overview_data = (
+            (f"{company_name} - {framework.upper()} Training Program",),
+            (f"Generated: {datetime.utcnow().strftime('%Y-%m-%d')}",),
+            *_TRAINING_OVERVIEW_ROWS
+        )
         
         # Create sheets for different training modules
-        sheets = {
-            "Overview": wb.active,
-            "Module Plan": wb.create_sheet("Module Plan"),
-            "Quiz Questions": wb.create_sheet("Quiz Questions"),
-            "Resources": wb.create_sheet("Resources")
-        }
-        
-        # Overview Sheet
-        ws = sheets["Overview"]
-        ws.title = "Overview"
-        
-        overview_data = [
-            [f"{company_name} - {framework.upper()} Training Program"],
-            [f"Generated: {datetime.utcnow().strftime('%Y-%m-%d')}"],
-            [""],
-            ["Module", "Duration", "Target Audience", "Status"],
-            ["Introduction to Compliance", "1 hour", "All Staff", "Available"],
-            ["Data Protection Basics", "2 hours", "All Staff", "Available"],
-            ["Security Best Practices", "1.5 hours", "Technical Staff", "In Development"],
-            ["Incident Response", "1 hour", "Management", "In Development"]
+        specs = [
+            SheetSpec("Overview", rows=overview_data),
+            SheetSpec("Module Plan"),
+            SheetSpec("Quiz Questions"),
+            SheetSpec("Resources")
         ]
+        return self._build_xlsx(self.output_dir / f"{base_filename}.xlsx", specs)
+    
+    def _build_xlsx(self, output_path: Path, specs: List[SheetSpec], max_width: int = 40) -> Path:
+        """Write a write-only workbook with one sheet per spec"""
         
-        for row_idx, row_data in enumerate(overview_data, 1):
-            for col_idx, value in enumerate(row_data, 1):
-                ws.cell(row=row_idx, column=col_idx, value=value)
-        
-        # Auto-adjust columns for all sheets
-        for sheet_name, sheet in sheets.items():
-            for column in sheet.columns:
-                max_length = 0
-                column = [cell for cell in column]
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 40)
-                if adjusted_width > 0:
-                    sheet.column_dimensions[column[0].column_letter].width = adjusted_width
+        wb = Workbook(write_only=True)
+        
+        for spec in specs:
+            ws = wb.create_sheet(spec.title)
+            
+            # Column widths must be set before the first row is streamed out
+            widths: Dict[int, int] = {}
+            for values in ((spec.title_row,) if spec.title_row else (), spec.headers, *spec.rows):
+                for col_idx, value in enumerate(values, 1):
+                    if value is not None:
+                        widths[col_idx] = max(widths.get(col_idx, 0), len(str(value)))
+            for col_idx, length in widths.items():
+                ws.column_dimensions[get_column_letter(col_idx)].width = min(length + 2, max_width)
+            
+            # Title row followed by a blank spacer row
+            if spec.title_row:
+                title_cell = WriteOnlyCell(ws, value=spec.title_row)
+                title_cell.font = TITLE_FONT
+                ws.append([title_cell])
+                ws.append([])
+                if spec.merge_title and len(spec.headers) > 1:
+                    ws.merged_cells.add(f"A1:{get_column_letter(len(spec.headers))}1")
+            
+            if spec.headers:
+                header_fill = None
+                if spec.header_fill:
+                    header_fill = PatternFill(start_color=spec.header_fill, end_color=spec.header_fill, fill_type="solid")
+                header_cells = []
+                for header in spec.headers:
+                    cell = WriteOnlyCell(ws, value=header)
+                    cell.font = BOLD_FONT
+                    if header_fill:
+                        cell.fill = header_fill
+                    header_cells.append(cell)
+                ws.append(header_cells)
+            
+            for row in spec.rows:
+                ws.append(row)
         
-        # Save workbook
-        output_path = self.output_dir / f"{base_filename}.xlsx"
         wb.save(str(output_path))
         
         return output_path
@@ -932,11 +890,30 @@ class ComplianceDocumentService:
         
         output_path = self.output_dir / f"{base_filename}.json"
         
-        # Write formatted JSON
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(content, f, indent=2, ensure_ascii=False, default=str)
+        # Serialize in memory, then write without blocking the event loop
+        data = json.dumps(content, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+        await _write_bytes_async(output_path, data)
         
         return output_path
 
+async def _write_bytes_async(path: Path, data: bytes) -> None:
+    """Write bytes to path off the event loop, chunking large payloads"""
+    
+    view = memoryview(data)
+    step = _ASYNC_WRITE_CHUNK if len(view) > _ASYNC_WRITE_THRESHOLD else len(view) or 1
+    
+    if AIOFILES_AVAILABLE:
+        async with aiofiles.open(path, 'wb', buffering=1 << 20) as f:
+            for start in range(0, len(view), step):
+                await f.write(view[start:start + step])
+        return
+    
+    f = await asyncio.to_thread(open, path, 'wb', buffering=1 << 20)
+    try:
+        for start in range(0, len(view), step):
+            await asyncio.to_thread(f.write, view[start:start + step])
+    finally:
+        await asyncio.to_thread(f.close)
+
 # Create singleton instance
 compliance_document_service = ComplianceDocumentService()
@@ -4,6 +4,8 @@ Centralized model management and API interactions
 """
 import sys
 import os
+import atexit
+import asyncio
 from pathlib import Path
 
 # Add the src directory to Python path
@@ -11,16 +13,47 @@ current_dir = Path(__file__).parent
 if str(current_dir) not in sys.path:
     sys.path.insert(0, str(current_dir))
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, SystemMessage
 import httpx
+import hashlib
+import importlib.util
 import logging
 import json
+import time
+import types
 from config import config
 
+# orjson is optional - fall back to the stdlib parser when it is not installed
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+    _JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    _loads = json.loads
+    _JSONDecodeError = json.JSONDecodeError
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
 logger = logging.getLogger(__name__)
 
+PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Upper bound on cached LLM responses (least recently used are evicted first)
+LLM_CACHE_MAX_ENTRIES = 512
+
+# Shared read-only stub returned when no Perplexity key is configured
+_PERPLEXITY_DISABLED_RESPONSE = types.MappingProxyType(
+    {"choices": [{"message": {"content": "Research API unavailable"}}]}
+)
+
 class LLMManager:
     """Centralized LLM management for compliance agent"""
     
@@ -33,57 +66,100 @@ class LLMManager:
         self.gpt_mini_model = config.gpt_mini_model
         self.gpt_standard_model = config.gpt_standard_model
         self.perplexity_model = config.perplexity_model
+        
+        # Fixed part of every Perplexity request body
+        self._perplexity_body_template = {
+            "model": self.perplexity_model,
+            "temperature": 0.2,
+            "return_citations": True,
+            "return_images": False
+        }
+        
+        # Lazily created clients, reused for the lifetime of the process
+        self._mini_llm: Optional[ChatOpenAI] = None
+        self._standard_llm: Optional[ChatOpenAI] = None
+        self._perplexity_client: Optional[httpx.AsyncClient] = None
+        
+        # key -> (expires_at, serialized response)
+        self.llm_cache_ttl = config.llm_cache_ttl
+        self._response_cache: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        
+        # Without a key every research query resolves to the same stub
+        if not self.perplexity_api_key:
+            logger.warning("Perplexity API key not configured - research queries disabled")
+            self.query_perplexity = self._perplexity_disabled
     
     def get_mini_llm(self) -> ChatOpenAI:
         """Get GPT Mini model for quick classification and lightweight tasks"""
-        return ChatOpenAI(
-            model=self.gpt_mini_model,
-            temperature=self.temperature,
-            openai_api_key=self.openai_api_key
-        )
+        if self._mini_llm is None:
+            self._mini_llm = ChatOpenAI(
+                model=self.gpt_mini_model,
+                temperature=self.temperature,
+                openai_api_key=self.openai_api_key
+            )
+        return self._mini_llm
     
     def get_standard_llm(self) -> ChatOpenAI:
         """Get GPT Standard model for complex analysis and detailed work"""
-        return ChatOpenAI(
-            model=self.gpt_standard_model,
-            temperature=self.temperature,
-            openai_api_key=self.openai_api_key
-        )
+        if self._standard_llm is None:
+            self._standard_llm = ChatOpenAI(
+                model=self.gpt_standard_model,
+                temperature=self.temperature,
+                openai_api_key=self.openai_api_key
+            )
+        return self._standard_llm
+    
+    def reset(self):
+        """Drop cached LLM clients and responses so they are rebuilt from the current settings"""
+        self._mini_llm = None
+        self._standard_llm = None
+        self._response_cache.clear()
+    
+    def _get_perplexity_client(self) -> httpx.AsyncClient:
+        """Get the shared Perplexity HTTP client (pooled, HTTP/2 when available)"""
+        if self._perplexity_client is None or self._perplexity_client.is_closed:
+            self._perplexity_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                headers={
+                    "Authorization": f"Bearer {self.perplexity_api_key}",
+                    "Content-Type": "application/json"
+                },
+                timeout=60.0
+            )
+        return self._perplexity_client
+    
+    async def aclose(self):
+        """Close the shared Perplexity HTTP client"""
+        if self._perplexity_client is not None:
+            await self._perplexity_client.aclose()
+            self._perplexity_client = None
+    
+    def close(self):
+        """Close the Perplexity client at interpreter exit, once the server's event loop has stopped"""
+        if self._perplexity_client is None or self._perplexity_client.is_closed:
+            return
+        try:
+            asyncio.run(self.aclose())
+        except Exception as e:
+            logger.debug(f"Could not close Perplexity client cleanly: {e}")
     
     async def query_perplexity(self, query: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
         """Query Perplexity for latest compliance research and regulatory updates"""
-        if not self.perplexity_api_key:
-            logger.warning("Perplexity API key not configured")
-            return {"choices": [{"message": {"content": "Research API unavailable"}}]}
-        
         try:
             messages = []
             if system_prompt:
                 messages.append({"role": "system", "content": system_prompt})
             messages.append({"role": "user", "content": query})
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.perplexity.ai/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.perplexity_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.perplexity_model,
-                        "messages": messages,
-                        "temperature": 0.2,
-                        "return_citations": True,
-                        "return_images": False
-                    },
-                    timeout=60.0
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    logger.error(f"Perplexity API error: {response.status_code} - {response.text}")
-                    return {"choices": [{"message": {"content": "Research query failed"}}]}
+            client = self._get_perplexity_client()
+            body = {**self._perplexity_body_template, "messages": messages}
+            response = await client.post(PERPLEXITY_API_URL, content=_dumps(body))
+            
+            if response.status_code == 200:
+                return _loads(response.content)
+            else:
+                logger.error(f"Perplexity API error: {response.status_code} - {response.text}")
+                return {"choices": [{"message": {"content": "Research query failed"}}]}
                     
         except httpx.TimeoutException:
             logger.error("Perplexity query timed out")
@@ -92,29 +168,87 @@ class LLMManager:
             logger.error(f"Perplexity query failed: {e}")
             return {"choices": [{"message": {"content": "Research unavailable due to error"}}]}
     
-    async def safe_llm_query(self, llm: ChatOpenAI, prompt: str, parse_json: bool = False) -> Dict[str, Any]:
-        """Safely query LLM with error handling and optional JSON parsing"""
+    async def _perplexity_disabled(self, query: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Stand-in for query_perplexity when no API key is configured"""
+        return _PERPLEXITY_DISABLED_RESPONSE
+    
+    async def safe_llm_query(
+        self,
+        llm: ChatOpenAI,
+        prompt: str,
+        parse_json: bool = False,
+        system: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Safely query LLM with error handling and optional JSON parsing
+        
+        A fixed system prompt is sent as its own message so providers can
+        cache it as a shared prefix across calls.
+        """
         try:
-            response = await llm.ainvoke([HumanMessage(content=prompt)])
+            messages = [HumanMessage(content=prompt)]
+            if system:
+                messages.insert(0, SystemMessage(content=system))
+            response = await llm.ainvoke(messages)
             content = response.content.strip()
             
             if parse_json:
                 # Try to extract JSON from response
                 if content.startswith("```json"):
-                    content = content.split("```json")[1].split("```")[0].strip()
+                    content = content[7:].partition("```")[0].strip()
                 elif content.startswith("```"):
-                    content = content.split("```")[1].split("```")[0].strip()
+                    content = content[3:].partition("```")[0].strip()
                 
-                return json.loads(content)
+                return _loads(content if isinstance(content, bytes) else content.encode())
             else:
                 return {"content": content, "success": True}
                 
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, _JSONDecodeError) as e:
             logger.error(f"JSON parsing failed: {e}")
             return {"error": "Invalid JSON response", "raw_content": content if 'content' in locals() else ""}
         except Exception as e:
             logger.error(f"LLM query failed: {e}")
             return {"error": str(e), "success": False}
 
+    def _response_cache_key(self, llm: ChatOpenAI, prompt: str, parse_json: bool, system: Optional[str]) -> str:
+        """Hash of (model, system, prompt, parse_json) identifying a cacheable query"""
+        model = getattr(llm, "model_name", "")
+        return hashlib.sha256(f"{model}\x00{parse_json}\x00{system or ''}\x00{prompt}".encode()).hexdigest()
+    
+    async def cached_llm_query(
+        self,
+        llm: ChatOpenAI,
+        prompt: str,
+        parse_json: bool = False,
+        system: Optional[str] = None,
+        cache_text: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """safe_llm_query backed by an in-process TTL cache; failed queries are never cached
+        
+        cache_text overrides the prompt as the cache key, so callers can strip
+        per-call details (indices, ids) that do not change the answer.
+        """
+        if self.llm_cache_ttl <= 0:
+            return await self.safe_llm_query(llm, prompt, parse_json=parse_json, system=system)
+        
+        key = self._response_cache_key(llm, cache_text if cache_text is not None else prompt, parse_json, system)
+        entry = self._response_cache.get(key)
+        if entry is not None:
+            expires_at, payload = entry
+            if expires_at > time.monotonic():
+                self._response_cache.move_to_end(key)
+                # Deserialize per hit so callers may mutate the result freely
+                return _loads(payload)
+            del self._response_cache[key]
+        
+        result = await self.safe_llm_query(llm, prompt, parse_json=parse_json, system=system)
+        
+        if "error" not in result:
+            self._response_cache[key] = (time.monotonic() + self.llm_cache_ttl, _dumps(result))
+            if len(self._response_cache) > LLM_CACHE_MAX_ENTRIES:
+                self._response_cache.popitem(last=False)
+        
+        return result
+
 # Global instance
 llm_manager = LLMManager()
+atexit.register(llm_manager.close)
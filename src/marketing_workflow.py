@@ -11,7 +11,7 @@ current_dir = Path(__file__).parent
 if str(current_dir) not in sys.path:
     sys.path.insert(0, str(current_dir))
 
-from typing import Dict, Any, List, Optional, TypedDict, Literal, Annotated
+from typing import Dict, Any, List, Mapping, Optional, Tuple, TypedDict, Literal, Annotated
 from enum import Enum
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
@@ -19,10 +19,17 @@ from datetime import datetime
 import logging
 import uuid
 import json
+import re
+import hashlib
+import shutil
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import threading
+import atexit
 import base64
-from io import BytesIO
+import types
 
 # Configure logging FIRST before using logger
 logging.basicConfig(
@@ -31,32 +38,246 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Document generation imports
+# orjson is optional - fall back to the stdlib encoder when it is not installed
 try:
-    from docx import Document
-    from docx.shared import Inches, Pt, RGBColor
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    DOCX_AVAILABLE = True
+    import orjson
+    
+    def _dumpb(obj: Any, sort_keys: bool = False) -> bytes:
+        """Indented UTF-8 JSON bytes for files"""
+        option = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=str, option=option)
 except ImportError:
-    DOCX_AVAILABLE = False
-    logger.warning("python-docx not installed. DOCX generation will be limited.")
+    def _dumpb(obj: Any, sort_keys: bool = False) -> bytes:
+        """Indented UTF-8 JSON bytes for files"""
+        return json.dumps(obj, indent=2, sort_keys=sort_keys, ensure_ascii=False, default=str).encode("utf-8")
 
-try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
-    from reportlab.lib import colors
-    from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-    logger.warning("reportlab not installed. PDF generation will be limited.")
+def _dumps(obj: Any, sort_keys: bool = False) -> str:
+    """Indented JSON text for prompts"""
+    return _dumpb(obj, sort_keys).decode("utf-8")
 
 # Import utilities
 from llm_utils import llm_manager
 from config import config
 from storage_utils import storage_manager, cosmos_manager
+from render_worker import write_document_file
+
+# One bounded pool for all blocking document rendering and file I/O
+DOC_EXECUTOR = ThreadPoolExecutor(max_workers=config.doc_render_workers, thread_name_prefix="doc-render")
+atexit.register(DOC_EXECUTOR.shutdown, wait=False)
+
+# Optional process pool for the GIL-bound DOCX/PDF rendering (DOC_RENDER_PROCESSES > 0)
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+
+def _get_render_pool() -> Optional[ProcessPoolExecutor]:
+    """Create the render process pool on first use; None when rendering stays in threads"""
+    global _render_pool
+    if _render_pool is None and config.doc_render_processes > 0:
+        with _render_pool_lock:
+            if _render_pool is None:
+                # forkserver forks workers from a single-threaded server that has already
+                # imported the lightweight renderer module, instead of forking this process
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("forkserver")
+                    context.set_forkserver_preload(["render_worker"])
+                else:
+                    context = multiprocessing.get_context("spawn")
+                _render_pool = ProcessPoolExecutor(max_workers=config.doc_render_processes, mp_context=context)
+                atexit.register(_render_pool.shutdown)
+    return _render_pool
+
+async def _run(fn, *args):
+    """Run a blocking callable on DOC_EXECUTOR without stalling the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(DOC_EXECUTOR, fn, *args)
+
+# Dependency-free documents are generated several per LLM call
+GENERATION_BATCH_SIZE = 4
+# Plans larger than this (serialized) always get a dedicated call
+MAX_BATCHED_PLAN_CHARS = 4000
+# Stop scheduling generations after this many tasks fail back to back on provider errors
+MAX_CONSECUTIVE_GENERATION_FAILURES = 3
+
+# Fixed instructions and JSON templates go in the system message so every call
+# shares a byte-identical prefix; only per-call context goes in the user message
+PLANNING_SYSTEM_PROMPT = """You are a marketing document specialist. Create a detailed execution plan for the deliverable provided by the user.
+
+Create a detailed document plan in JSON format:
+{
+    "document_id": "DOCUMENT ID provided by the user",
+    "title": "Document Title",
+    "type": "brief|schema|checklist|guide|calendar|matrix|specification|dashboard|playbook",
+    "description": "What this document accomplishes",
+    "target_audience": "Who will use this document",
+    "format": "docx|pdf|xlsx|json|yaml",
+    "estimated_length": "pages or sections",
+    "key_sections": [
+        {
+            "section_name": "Section Name",
+            "section_description": "What this section covers",
+            "content_type": "narrative|technical|visual|data",
+            "estimated_length": "paragraphs/pages"
+        }
+    ],
+    "dependencies": ["List of other document IDs this depends on"],
+    "validation_criteria": [
+        "Specific criteria to validate this document"
+    ],
+    "quality_requirements": [
+        "Quality standards this document must meet"
+    ]
+}"""
+
+_DOCUMENT_CONTENT_SCHEMA = """{
+    "document_metadata": {
+        "title": "title from the document plan",
+        "type": "type from the document plan",
+        "version": "1.0",
+        "created_date": "CREATED DATE provided by the user",
+        "target_audience": "target_audience from the document plan, or General"
+    },
+    "executive_summary": "Brief overview of this document",
+    "sections": [
+        {
+            "section_title": "Section Title",
+            "content": "Detailed content for this section",
+            "subsections": [
+                {
+                    "title": "Subsection Title",
+                    "content": "Subsection content"
+                }
+            ]
+        }
+    ],
+    "key_takeaways": [
+        "Key point 1",
+        "Key point 2"
+    ],
+    "next_steps": [
+        "Action item 1",
+        "Action item 2"
+    ],
+    "appendices": [
+        {
+            "title": "Appendix Title",
+            "content": "Supporting information"
+        }
+    ]
+}"""
+
+_GENERATION_REQUIREMENTS = """REQUIREMENTS:
+1. Create professional, actionable content
+2. Ensure alignment with the deliverable description
+3. Include specific examples and implementation details
+4. Make content immediately usable by the target audience
+5. Follow marketing best practices"""
+
+GENERATION_SYSTEM_PROMPT = f"""You are a marketing document specialist. Generate comprehensive content for the document plan provided by the user.
+
+Generate complete document content in JSON format:
+{_DOCUMENT_CONTENT_SCHEMA}
+
+{_GENERATION_REQUIREMENTS}"""
+
+GENERATION_BATCH_SYSTEM_PROMPT = f"""You are a marketing document specialist. Generate comprehensive content for each of the document plans provided by the user.
+
+Return a single JSON object of the form {{"documents": [...]}} with one entry per plan, in the same order.
+Each entry must carry the "document_id" of its plan alongside the document content in this JSON format:
+{_DOCUMENT_CONTENT_SCHEMA}
+
+{_GENERATION_REQUIREMENTS}"""
+
+VALIDATION_SYSTEM_PROMPT = """Validate the document provided by the user against its requirements and quality standards.
+
+Provide validation results in JSON format:
+{
+    "overall_pass": true/false,
+    "quality_score": 0.0-1.0,
+    "criteria_met": [
+        {"criterion": "criterion text", "met": true/false, "notes": "explanation"}
+    ],
+    "issues_found": [
+        {"severity": "critical|major|minor", "issue": "description", "suggestion": "how to fix"}
+    ],
+    "strengths": ["list of strong points"],
+    "recommendations": ["list of improvement suggestions"]
+}"""
+
+CONSISTENCY_SYSTEM_PROMPT = """Validate consistency and alignment across all generated documents provided by the user.
+
+CHECK FOR:
+1. Terminology consistency across documents
+2. Timeline and date alignment
+3. Metric and KPI consistency
+4. Brand voice and tone alignment
+5. Technical specification consistency
+6. Process and workflow alignment
+7. Coverage of all success criteria across documents
+
+Provide validation results in JSON format:
+{
+    "overall_consistency": true/false,
+    "consistency_score": 0.0-1.0,
+    "inconsistencies_found": [
+        {
+            "type": "terminology|timeline|metric|voice|technical|process",
+            "severity": "critical|major|minor",
+            "documents_affected": ["doc_id1", "doc_id2"],
+            "description": "What is inconsistent",
+            "resolution": "How to fix"
+        }
+    ],
+    "success_criteria_coverage": {
+        "all_criteria_covered": true/false,
+        "coverage_by_criterion": [
+            {"criterion": "text", "covered": true/false, "documents": ["doc_ids"]}
+        ]
+    },
+    "alignment_strengths": ["What is well-aligned"],
+    "recommendations": ["Overall improvement suggestions"]
+}"""
+
+# Per-call user messages, filled with str.format_map
+PLANNING_PROMPT_TEMPLATE = """DELIVERABLE: {deliverable}
+
+DOCUMENT ID: {document_id}
+
+PROJECT CONTEXT:
+Research Summary: {research_summary}
+Success Criteria: {success_criteria_json}
+User Context: {user_responses_json}"""
+
+GENERATION_PROMPT_TEMPLATE = """DOCUMENT PLAN:
+{document_plan}
+
+CREATED DATE: {created_date}
+
+PROJECT CONTEXT:
+{project_context}"""
+
+GENERATION_BATCH_PROMPT_TEMPLATE = """DOCUMENT PLANS:
+[{document_plans}]
+
+CREATED DATE: {created_date}
+
+PROJECT CONTEXT:
+{project_context}"""
+
+VALIDATION_PROMPT_TEMPLATE = """DOCUMENT PLAN:
+{document_plan}
+
+GENERATED CONTENT (summary):
+{content_summary}
+
+SUCCESS CRITERIA TO CHECK:
+{success_criteria_json}"""
+
+CONSISTENCY_PROMPT_TEMPLATE = """DOCUMENT SUMMARIES:
+{document_summaries}
+
+PROJECT SUCCESS CRITERIA:
+{success_criteria_json}"""
 
 class DocumentStatus(str, Enum):
     PENDING = "pending"
@@ -113,6 +334,7 @@ class MarketingDocumentState(TypedDict):
     current_stage: str
     error_message: Optional[str]
     retry_count: int
+    _initialized: bool  # Set once ensure_state_initialization has filled the defaults
     
     # Output
     final_deliverables: Dict[str, Any]  # Final package with all documents
@@ -127,45 +349,51 @@ class MarketingDocumentState(TypedDict):
     updated_at: datetime
     processing_duration: Optional[float]
 
+# Container fields every node expects, with the factory for their empty value
+_DEFAULTS = (
+    ("messages", list),
+    ("document_plans", list),
+    ("document_contents", dict),
+    ("document_files", dict),
+    ("document_urls", list),
+    ("document_status", dict),
+    ("validation_results", dict),
+    ("quality_scores", dict),
+    ("criteria_validation", dict),
+    ("document_dependencies", dict),
+    ("cross_document_validation", dict),
+    ("final_deliverables", dict),
+    ("executive_summary", dict),
+    ("document_manifest", list)
+)
+
 def ensure_state_initialization(state: MarketingDocumentState) -> MarketingDocumentState:
     """Ensure all required state fields are initialized"""
-    # Core structures
-    if "messages" not in state or state["messages"] is None:
-        state["messages"] = []
-    if "document_plans" not in state or state["document_plans"] is None:
-        state["document_plans"] = []
-    if "document_contents" not in state or state["document_contents"] is None:
-        state["document_contents"] = {}
-    if "document_files" not in state or state["document_files"] is None:
-        state["document_files"] = {}
-    if "document_urls" not in state or state["document_urls"] is None:
-        state["document_urls"] = []
-    if "document_status" not in state or state["document_status"] is None:
-        state["document_status"] = {}
-    if "validation_results" not in state or state["validation_results"] is None:
-        state["validation_results"] = {}
-    if "quality_scores" not in state or state["quality_scores"] is None:
-        state["quality_scores"] = {}
-    if "criteria_validation" not in state or state["criteria_validation"] is None:
-        state["criteria_validation"] = {}
-    if "document_dependencies" not in state or state["document_dependencies"] is None:
-        state["document_dependencies"] = {}
-    if "cross_document_validation" not in state or state["cross_document_validation"] is None:
-        state["cross_document_validation"] = {}
-    if "final_deliverables" not in state or state["final_deliverables"] is None:
-        state["final_deliverables"] = {}
-    if "executive_summary" not in state or state["executive_summary"] is None:
-        state["executive_summary"] = {}
-    if "document_manifest" not in state or state["document_manifest"] is None:
-        state["document_manifest"] = []
+    # Fields are only ever filled in, so one pass per workflow run is enough
+    if state.get("_initialized"):
+        return state
+    
+    for key, factory in _DEFAULTS:
+        if state.get(key) is None:
+            state[key] = factory()
     
     # Extract success criteria from project brief if not set
-    if "success_criteria" not in state or state["success_criteria"] is None:
+    if state.get("success_criteria") is None:
         project_brief = state.get("project_brief", {})
         state["success_criteria"] = project_brief.get("success_criteria", [])
     
+    state["_initialized"] = True
+    
     return state
 
+# Shared read-only default for lookups of possibly-missing per-document results
+_EMPTY: Mapping[str, Any] = types.MappingProxyType({})
+
+def aggregate_scores(quality_scores: Dict[str, float], criteria_validation: Dict[str, bool]) -> Tuple[float, int]:
+    """Average quality score (0 when nothing was scored) and number of success criteria met"""
+    average_quality = sum(quality_scores.values()) / len(quality_scores) if quality_scores else 0
+    return average_quality, sum(criteria_validation.values())
+
 def handle_node_error(state: MarketingDocumentState, error: Exception, node_name: str) -> MarketingDocumentState:
     """Centralized error handling for all nodes"""
     logger.error(f"Error in {node_name}: {error}", exc_info=True)
@@ -182,11 +410,20 @@ def handle_node_error(state: MarketingDocumentState, error: Exception, node_name
     
     return state
 
+async def _bounded(semaphore: asyncio.Semaphore, coro, timeout: Optional[float] = None):
+    """Await coro while holding a slot of the shared LLM semaphore, optionally with a timeout"""
+    try:
+        async with semaphore:
+            return await asyncio.wait_for(coro, timeout)
+    finally:
+        # Closes coro if the task was cancelled before it got a slot
+        coro.close()
+
 async def analyze_document_requirements(state: MarketingDocumentState) -> MarketingDocumentState:
     """Analyze deliverable blueprint and create detailed document plans"""
     
     try:
-        logger.info(f"Analyzing document requirements for request: {state.get('request_id')}")
+        logger.info("Analyzing document requirements for request: %s", state.get('request_id'))
         
         state = ensure_state_initialization(state)
         
@@ -203,56 +440,45 @@ async def analyze_document_requirements(state: MarketingDocumentState) -> Market
         
         llm = llm_manager.get_standard_llm()
         
-        # Create detailed plan for each document
-        document_plans = []
+        # Serialized once and shared by every planning prompt; only the deliverable varies
+        prompt_context = {
+            "research_summary": project_brief.get('research_summary', 'Not provided'),
+            "success_criteria_json": _dumps(state.get('success_criteria', [])),
+            "user_responses_json": _dumps(user_responses)
+        }
+        
+        # Build every planning prompt up front, then query them concurrently
+        doc_ids = []
+        planning_tasks = []
+        semaphore = asyncio.Semaphore(config.max_parallel_llm)
         
         for i, deliverable in enumerate(deliverable_blueprint):
-            planning_prompt = f"""
-            You are a marketing document specialist. Create a detailed execution plan for this deliverable.
-            
-            DELIVERABLE: {deliverable}
-            
-            PROJECT CONTEXT:
-            Research Summary: {project_brief.get('research_summary', 'Not provided')}
-            Success Criteria: {json.dumps(state.get('success_criteria', []), indent=2)}
-            User Context: {json.dumps(user_responses, indent=2)}
-            
-            Create a detailed document plan in JSON format:
-            {{
-                "document_id": "doc_{i+1:03d}",
-                "title": "Document Title",
-                "type": "brief|schema|checklist|guide|calendar|matrix|specification|dashboard|playbook",
-                "description": "What this document accomplishes",
-                "target_audience": "Who will use this document",
-                "format": "docx|pdf|xlsx|json|yaml",
-                "estimated_length": "pages or sections",
-                "key_sections": [
-                    {{
-                        "section_name": "Section Name",
-                        "section_description": "What this section covers",
-                        "content_type": "narrative|technical|visual|data",
-                        "estimated_length": "paragraphs/pages"
-                    }}
-                ],
-                "dependencies": ["List of other document IDs this depends on"],
-                "validation_criteria": [
-                    "Specific criteria to validate this document"
-                ],
-                "quality_requirements": [
-                    "Quality standards this document must meet"
-                ]
-            }}
-            """
-            
-            plan_result = await llm_manager.safe_llm_query(llm, planning_prompt, parse_json=True)
+            doc_id = f"doc_{i+1:03d}"
+            prompt_context["deliverable"] = deliverable
+            prompt_context["document_id"] = doc_id
+            planning_prompt = PLANNING_PROMPT_TEMPLATE.format_map(prompt_context)
             
-            if "error" not in plan_result:
+            doc_ids.append(doc_id)
+            # Key the cache without the index so reordered blueprints still hit
+            planning_tasks.append(_bounded(semaphore, llm_manager.cached_llm_query(
+                llm, planning_prompt, parse_json=True, system=PLANNING_SYSTEM_PROMPT,
+                cache_text=planning_prompt.replace(doc_id, "doc_id")
+            )))
+        
+        plan_results = await asyncio.gather(*planning_tasks, return_exceptions=True)
+        
+        # Create detailed plan for each document
+        document_plans = []
+        
+        for doc_id, deliverable, plan_result in zip(doc_ids, deliverable_blueprint, plan_results):
+            if not isinstance(plan_result, Exception) and "error" not in plan_result:
+                plan_result["document_id"] = doc_id
                 plan_result["deliverable_description"] = deliverable
                 document_plans.append(plan_result)
             else:
                 # Fallback plan
                 document_plans.append({
-                    "document_id": f"doc_{i+1:03d}",
+                    "document_id": doc_id,
                     "title": deliverable[:50],
                     "type": "document",
                     "deliverable_description": deliverable,
@@ -284,74 +510,51 @@ async def analyze_document_requirements(state: MarketingDocumentState) -> Market
     except Exception as e:
         return handle_node_error(state, e, "analyze_document_requirements")
 
-async def generate_document_content(doc_plan: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
-    """Generate content for a single document"""
+def _plan_json(doc_plan: Dict[str, Any], context: Mapping[str, Any]) -> str:
+    """Serialized plan for prompts, reusing the copy cached in the generation context"""
+    cached = context.get("plan_json", {}).get(doc_plan.get("document_id"))
+    return cached if cached is not None else _dumps(doc_plan)
+
+def _project_context_block(context: Mapping[str, Any]) -> str:
+    """PROJECT CONTEXT lines for generation prompts, reusing the cached copy when present"""
+    block = context.get("project_context_block")
+    if block is None:
+        block = (
+            f"Research Summary: {context.get('research_summary', 'Not provided')}\n"
+            f"Success Criteria: {_dumps(context.get('success_criteria', []))}\n"
+            f"User Context: {_dumps(context.get('user_responses', {}))}"
+        )
+    return block
+
+async def generate_document_content(
+    doc_plan: Dict[str, Any],
+    context: Mapping[str, Any],
+    previous_documents: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """Generate content for a single document
+    
+    context is shared read-only by every generation task; previous_documents
+    maps dependency ids to their executive summaries for this document only.
+    """
     
     doc_id = doc_plan.get("document_id")
     
     try:
-        logger.info(f"Generating content for: {doc_id} - {doc_plan.get('title')}")
+        logger.info("Generating content for: %s - %s", doc_id, doc_plan.get('title'))
         
         llm = llm_manager.get_standard_llm()
         
-        generation_prompt = f"""
-        You are a marketing document specialist. Generate comprehensive content for this document.
-        
-        DOCUMENT PLAN:
-        {json.dumps(doc_plan, indent=2)}
-        
-        PROJECT CONTEXT:
-        Research Summary: {context.get('research_summary', 'Not provided')}
-        Success Criteria: {json.dumps(context.get('success_criteria', []), indent=2)}
-        User Context: {json.dumps(context.get('user_responses', {}), indent=2)}
-        
-        Generate complete document content in JSON format:
-        {{
-            "document_metadata": {{
-                "title": "{doc_plan.get('title')}",
-                "type": "{doc_plan.get('type')}",
-                "version": "1.0",
-                "created_date": "{datetime.utcnow().isoformat()}",
-                "target_audience": "{doc_plan.get('target_audience', 'General')}"
-            }},
-            "executive_summary": "Brief overview of this document",
-            "sections": [
-                {{
-                    "section_title": "Section Title",
-                    "content": "Detailed content for this section",
-                    "subsections": [
-                        {{
-                            "title": "Subsection Title",
-                            "content": "Subsection content"
-                        }}
-                    ]
-                }}
-            ],
-            "key_takeaways": [
-                "Key point 1",
-                "Key point 2"
-            ],
-            "next_steps": [
-                "Action item 1",
-                "Action item 2"
-            ],
-            "appendices": [
-                {{
-                    "title": "Appendix Title",
-                    "content": "Supporting information"
-                }}
-            ]
-        }}
-        
-        REQUIREMENTS:
-        1. Create professional, actionable content
-        2. Ensure alignment with the deliverable description
-        3. Include specific examples and implementation details
-        4. Make content immediately usable by the target audience
-        5. Follow marketing best practices
-        """
+        generation_prompt = GENERATION_PROMPT_TEMPLATE.format(
+            document_plan=_plan_json(doc_plan, context),
+            created_date=datetime.utcnow().isoformat(),
+            project_context=_project_context_block(context)
+        )
+        if previous_documents:
+            generation_prompt += f"\n\nRELATED DOCUMENTS (executive summaries):\n{_dumps(previous_documents)}"
         
-        content_result = await llm_manager.safe_llm_query(llm, generation_prompt, parse_json=True)
+        content_result = await llm_manager.safe_llm_query(
+            llm, generation_prompt, parse_json=True, system=GENERATION_SYSTEM_PROMPT
+        )
         
         if "error" not in content_result:
             return {
@@ -365,18 +568,69 @@ async def generate_document_content(doc_plan: Dict[str, Any], context: Dict[str,
                 "document_id": doc_id,
                 "status": "failed",
                 "error": content_result.get("error"),
+                # safe_llm_query attaches raw_content only when the provider answered with non-JSON
+                "provider_error": "raw_content" not in content_result,
                 "success": False
             }
     
     except Exception as e:
-        logger.error(f"Content generation failed for {doc_id}: {e}")
+        logger.error("Content generation failed for %s: %s", doc_id, e)
         return {
             "document_id": doc_id,
             "status": "failed",
             "error": str(e),
+            "provider_error": True,
             "success": False
         }
 
+async def generate_document_batch(doc_plans: List[Dict[str, Any]], context: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """Generate content for several dependency-free documents in one LLM call"""
+    
+    if len(doc_plans) == 1:
+        return [await generate_document_content(doc_plans[0], context)]
+    
+    doc_ids = [plan.get("document_id") for plan in doc_plans]
+    generated = {}
+    
+    try:
+        logger.info("Generating batched content for: %s", doc_ids)
+        
+        llm = llm_manager.get_standard_llm()
+        
+        batch_prompt = GENERATION_BATCH_PROMPT_TEMPLATE.format(
+            document_plans=",".join(_plan_json(plan, context) for plan in doc_plans),
+            created_date=datetime.utcnow().isoformat(),
+            project_context=_project_context_block(context)
+        )
+        
+        batch_result = await llm_manager.safe_llm_query(
+            llm, batch_prompt, parse_json=True, system=GENERATION_BATCH_SYSTEM_PROMPT
+        )
+        
+        for document in batch_result.get("documents", []) if isinstance(batch_result, dict) else []:
+            if isinstance(document, dict) and document.get("document_id") in doc_ids:
+                doc_id = document.pop("document_id")
+                generated[doc_id] = {
+                    "document_id": doc_id,
+                    "status": "generated",
+                    "content": document,
+                    "success": True
+                }
+    
+    except Exception as e:
+        logger.error("Batched content generation failed for %s: %s", doc_ids, e)
+    
+    # Anything the batch did not return is generated on its own, one call at a time:
+    # the caller holds a single MAX_PARALLEL_LLM slot for the whole batch
+    missing = [plan for plan in doc_plans if plan.get("document_id") not in generated]
+    if missing:
+        logger.info("Falling back to single generation for %d document(s)", len(missing))
+        for plan in missing:
+            result = await generate_document_content(plan, context)
+            generated[result["document_id"]] = result
+    
+    return [generated[doc_id] for doc_id in doc_ids]
+
 async def generate_all_documents(state: MarketingDocumentState) -> MarketingDocumentState:
     """Generate content for all planned documents"""
     
@@ -400,66 +654,131 @@ async def generate_all_documents(state: MarketingDocumentState) -> MarketingDocu
             "implementation_approach": project_brief.get("implementation_approach", "")
         }
         
-        # Check for dependencies and generate in order
+        # Serialize the shared prompt pieces once for every generation call
+        generation_context["project_context_block"] = _project_context_block(generation_context)
+        generation_context["plan_json"] = {
+            plan["document_id"]: _dumps(plan) for plan in document_plans
+        }
+        # Every task reads the same context object; per-document data travels separately
+        generation_context = types.MappingProxyType(generation_context)
+        
+        # Kahn-style scheduling: a document becomes ready once all its dependencies generated
+        dependencies = state["document_dependencies"]
+        plans_by_id = {plan["document_id"]: plan for plan in document_plans}
+        indegree = {doc_id: len(dependencies.get(doc_id, [])) for doc_id in plans_by_id}
+        dependents = {doc_id: [] for doc_id in plans_by_id}
+        for doc_id in plans_by_id:
+            for dep in dependencies.get(doc_id, []):
+                if dep in dependents:
+                    dependents[dep].append(doc_id)
+        
+        ready = deque(doc_id for doc_id, count in indegree.items() if count == 0)
         generated_docs = {}
-        pending_docs = document_plans.copy()
-        max_iterations = len(document_plans) * 2  # Prevent infinite loops
-        iteration = 0
+        running = {}  # task -> plans it generates
+        semaphore = asyncio.Semaphore(config.max_parallel_llm)
+        consecutive_failures = 0
         
-        while pending_docs and iteration < max_iterations:
-            iteration += 1
-            docs_to_generate = []
+        while ready or running:
+            ready_plans = [plans_by_id[ready.popleft()] for _ in range(len(ready))]
             
-            for doc_plan in pending_docs:
-                doc_id = doc_plan["document_id"]
-                deps = state["document_dependencies"].get(doc_id, [])
-                
-                # Check if all dependencies are satisfied
-                if all(dep in generated_docs for dep in deps):
-                    docs_to_generate.append(doc_plan)
+            # Small dependency-free plans share one context, so pack them into batched calls
+            batchable = [
+                doc_plan for doc_plan in ready_plans
+                if not dependencies.get(doc_plan["document_id"])
+                and len(generation_context["plan_json"][doc_plan["document_id"]]) <= MAX_BATCHED_PLAN_CHARS
+            ]
+            batched_ids = {doc_plan["document_id"] for doc_plan in batchable}
             
-            if not docs_to_generate:
-                # No documents can be generated (circular dependency or error)
-                logger.warning("Cannot resolve document dependencies")
-                break
+            for start in range(0, len(batchable), GENERATION_BATCH_SIZE):
+                chunk = batchable[start:start + GENERATION_BATCH_SIZE]
+                # A batch may fall back to sequential single calls after the batched one,
+                # so its budget covers one call per plan plus the batch itself
+                task = asyncio.ensure_future(_bounded(
+                    semaphore,
+                    generate_document_batch(chunk, generation_context),
+                    timeout=config.llm_call_timeout * (len(chunk) + 1)
+                ))
+                running[task] = chunk
             
-            # Generate documents in parallel batch
-            tasks = []
-            for doc_plan in docs_to_generate:
-                # Add previously generated docs to context for reference
-                context = generation_context.copy()
-                context["previous_documents"] = {
+            for doc_plan in ready_plans:
+                if doc_plan["document_id"] in batched_ids:
+                    continue
+                
+                # Pass previously generated docs alongside the shared context for reference
+                previous_documents = {
                     dep_id: generated_docs[dep_id].get("content", {}).get("executive_summary", "")
-                    for dep_id in state["document_dependencies"].get(doc_plan["document_id"], [])
+                    for dep_id in dependencies.get(doc_plan["document_id"], [])
                     if dep_id in generated_docs
                 }
                 
-                tasks.append(generate_document_content(doc_plan, context))
+                task = asyncio.ensure_future(_bounded(
+                    semaphore,
+                    generate_document_content(doc_plan, generation_context, previous_documents),
+                    timeout=config.llm_call_timeout
+                ))
+                running[task] = [doc_plan]
             
-            # Execute batch
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            # Handle whichever generations finish first; their dependents may become ready
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
             
-            # Process results
-            for doc_plan, result in zip(docs_to_generate, results):
-                doc_id = doc_plan["document_id"]
+            for task in done:
+                plans = running.pop(task)
                 
-                if isinstance(result, Exception):
-                    state["document_status"][doc_id] = DocumentStatus.FAILED
-                    state["document_contents"][doc_id] = {"error": str(result)}
+                # One result per plan; a failed task fails every plan it carried
+                if task.exception() is not None:
+                    results = [task.exception()] * len(plans)
                 else:
-                    if result.get("success"):
-                        state["document_status"][doc_id] = DocumentStatus.REVIEWING
-                        state["document_contents"][doc_id] = result.get("content", {})
-                        generated_docs[doc_id] = result
-                    else:
+                    task_result = task.result()
+                    results = task_result if isinstance(task_result, list) else [task_result]
+                
+                # Only exceptions, timeouts and provider errors count towards the circuit
+                # breaker; any completed response - even malformed content - resets it
+                provider_failed = True
+                for doc_plan, result in zip(plans, results):
+                    doc_id = doc_plan["document_id"]
+                    
+                    if isinstance(result, Exception):
                         state["document_status"][doc_id] = DocumentStatus.FAILED
-                        state["document_contents"][doc_id] = {"error": result.get("error")}
+                        state["document_contents"][doc_id] = {"error": str(result) or type(result).__name__}
+                    else:
+                        if result.get("success"):
+                            provider_failed = False
+                            state["document_status"][doc_id] = DocumentStatus.REVIEWING
+                            state["document_contents"][doc_id] = result.get("content", {})
+                            generated_docs[doc_id] = result
+                            
+                            for dependent in dependents[doc_id]:
+                                indegree[dependent] -= 1
+                                if indegree[dependent] == 0:
+                                    ready.append(dependent)
+                        else:
+                            if not result.get("provider_error", True):
+                                provider_failed = False
+                            state["document_status"][doc_id] = DocumentStatus.FAILED
+                            state["document_contents"][doc_id] = {"error": result.get("error")}
                 
-                # Remove from pending
-                pending_docs = [d for d in pending_docs if d["document_id"] != doc_id]
+                consecutive_failures = consecutive_failures + 1 if provider_failed else 0
+            
+            # Circuit breaker: the provider is most likely down or rate-limiting
+            if consecutive_failures >= MAX_CONSECUTIVE_GENERATION_FAILURES:
+                logger.error("Aborting document generation after %d consecutive failed generations", consecutive_failures)
+                # Running, ready and still-waiting documents alike will never be generated now
+                for doc_id in plans_by_id:
+                    if doc_id not in generated_docs and state["document_status"].get(doc_id) != DocumentStatus.FAILED:
+                        state["document_status"][doc_id] = DocumentStatus.FAILED
+                        state["document_contents"][doc_id] = {"error": "Generation aborted after repeated failures"}
+                for task in running:
+                    task.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+                running.clear()
+                break
+        
+        if any(count > 0 for count in indegree.values()):
+            # Some documents never became ready (circular, missing or failed dependency)
+            logger.warning("Cannot resolve document dependencies")
         
         # Count results
-        successful = len([s for s in state["document_status"].values() if s == DocumentStatus.REVIEWING])
+        successful = sum(1 for s in state["document_status"].values() if s == DocumentStatus.REVIEWING)
         total = len(document_plans)
         
         state["messages"].append(AIMessage(
@@ -471,6 +790,32 @@ async def generate_all_documents(state: MarketingDocumentState) -> MarketingDocu
     except Exception as e:
         return handle_node_error(state, e, "generate_all_documents")
 
+def _summarize_for_validation(content: Any) -> str:
+    """Compact structural view of a generated document, as JSON text for the validator prompt"""
+    if not isinstance(content, dict):
+        # Unexpected shapes (e.g. a bare JSON list) go to the validator as truncated JSON
+        return _dumps(content)[:3000]
+    return _dumps({
+        "document_metadata": content.get("document_metadata", {}),
+        "executive_summary": str(content.get("executive_summary", ""))[:500],
+        "sections": [
+            {
+                "section_title": section.get("section_title", ""),
+                "content": str(section.get("content", ""))[:200],
+                "subsections": [
+                    subsection.get("title", "")
+                    for subsection in section.get("subsections") or []
+                    if isinstance(subsection, dict)
+                ]
+            }
+            for section in content.get("sections") or []
+            if isinstance(section, dict)
+        ],
+        "key_takeaways": content.get("key_takeaways", []),
+        "next_steps": content.get("next_steps", []),
+        "appendix_count": len(content.get("appendices") or [])
+    }, sort_keys=True)
+
 async def validate_individual_documents(state: MarketingDocumentState) -> MarketingDocumentState:
     """Validate each document against requirements and quality standards"""
     
@@ -485,45 +830,36 @@ async def validate_individual_documents(state: MarketingDocumentState) -> Market
         
         llm = llm_manager.get_mini_llm()  # Use mini model for validation
         
+        prompt_context = {"success_criteria_json": _dumps(state.get('success_criteria', []))}
+        plans_by_id = {plan["document_id"]: plan for plan in state["document_plans"]}
+        
+        # Collect every document awaiting review, then validate them concurrently
+        doc_ids = []
+        validation_tasks = []
+        semaphore = asyncio.Semaphore(config.max_parallel_llm)
+        
         for doc_id, content in state["document_contents"].items():
             if state["document_status"][doc_id] != DocumentStatus.REVIEWING:
                 continue
             
             # Find the original plan for this document
-            doc_plan = next((p for p in state["document_plans"] if p["document_id"] == doc_id), None)
+            doc_plan = plans_by_id.get(doc_id)
             if not doc_plan:
                 continue
             
-            validation_prompt = f"""
-            Validate this document against its requirements and quality standards.
-            
-            DOCUMENT PLAN:
-            {json.dumps(doc_plan, indent=2)}
+            prompt_context["document_plan"] = _dumps(doc_plan)
+            prompt_context["content_summary"] = _summarize_for_validation(content)
+            validation_prompt = VALIDATION_PROMPT_TEMPLATE.format_map(prompt_context)
             
-            GENERATED CONTENT:
-            {json.dumps(content, indent=2)[:3000]}...  # Truncate for context window
-            
-            SUCCESS CRITERIA TO CHECK:
-            {json.dumps(state.get('success_criteria', []), indent=2)}
-            
-            Provide validation results in JSON format:
-            {{
-                "overall_pass": true/false,
-                "quality_score": 0.0-1.0,
-                "criteria_met": [
-                    {{"criterion": "criterion text", "met": true/false, "notes": "explanation"}}
-                ],
-                "issues_found": [
-                    {{"severity": "critical|major|minor", "issue": "description", "suggestion": "how to fix"}}
-                ],
-                "strengths": ["list of strong points"],
-                "recommendations": ["list of improvement suggestions"]
-            }}
-            """
-            
-            validation_result = await llm_manager.safe_llm_query(llm, validation_prompt, parse_json=True)
-            
-            if "error" not in validation_result:
+            doc_ids.append(doc_id)
+            validation_tasks.append(_bounded(semaphore, llm_manager.cached_llm_query(
+                llm, validation_prompt, parse_json=True, system=VALIDATION_SYSTEM_PROMPT
+            )))
+        
+        validation_results = await asyncio.gather(*validation_tasks, return_exceptions=True)
+        
+        for doc_id, validation_result in zip(doc_ids, validation_results):
+            if not isinstance(validation_result, Exception) and "error" not in validation_result:
                 state["validation_results"][doc_id] = validation_result
                 state["quality_scores"][doc_id] = validation_result.get("quality_score", 0.5)
                 
@@ -541,8 +877,10 @@ async def validate_individual_documents(state: MarketingDocumentState) -> Market
                 state["validation_results"][doc_id] = {"error": "Validation failed"}
                 state["quality_scores"][doc_id] = 0.5
         
+        average_quality, _ = aggregate_scores(state["quality_scores"], state["criteria_validation"])
+        
         state["messages"].append(AIMessage(
-            content=f"Individual validation complete. Average quality score: {sum(state['quality_scores'].values())/len(state['quality_scores']):.2f}"
+            content=f"Individual validation complete. Average quality score: {average_quality:.2f}"
         ))
         
         return state
@@ -575,49 +913,14 @@ async def validate_cross_document_consistency(state: MarketingDocumentState) ->
                     "key_takeaways": content.get("key_takeaways", [])
                 })
         
-        consistency_prompt = f"""
-        Validate consistency and alignment across all generated documents.
-        
-        DOCUMENT SUMMARIES:
-        {json.dumps(doc_summaries, indent=2)}
-        
-        PROJECT SUCCESS CRITERIA:
-        {json.dumps(state.get('success_criteria', []), indent=2)}
-        
-        CHECK FOR:
-        1. Terminology consistency across documents
-        2. Timeline and date alignment
-        3. Metric and KPI consistency
-        4. Brand voice and tone alignment
-        5. Technical specification consistency
-        6. Process and workflow alignment
-        7. Coverage of all success criteria across documents
-        
-        Provide validation results in JSON format:
-        {{
-            "overall_consistency": true/false,
-            "consistency_score": 0.0-1.0,
-            "inconsistencies_found": [
-                {{
-                    "type": "terminology|timeline|metric|voice|technical|process",
-                    "severity": "critical|major|minor",
-                    "documents_affected": ["doc_id1", "doc_id2"],
-                    "description": "What is inconsistent",
-                    "resolution": "How to fix"
-                }}
-            ],
-            "success_criteria_coverage": {{
-                "all_criteria_covered": true/false,
-                "coverage_by_criterion": [
-                    {{"criterion": "text", "covered": true/false, "documents": ["doc_ids"]}}
-                ]
-            }},
-            "alignment_strengths": ["What is well-aligned"],
-            "recommendations": ["Overall improvement suggestions"]
-        }}
-        """
+        consistency_prompt = CONSISTENCY_PROMPT_TEMPLATE.format(
+            document_summaries=_dumps(doc_summaries),
+            success_criteria_json=_dumps(state.get('success_criteria', []))
+        )
         
-        consistency_result = await llm_manager.safe_llm_query(llm, consistency_prompt, parse_json=True)
+        consistency_result = await llm_manager.safe_llm_query(
+            llm, consistency_prompt, parse_json=True, system=CONSISTENCY_SYSTEM_PROMPT
+        )
         
         if "error" not in consistency_result:
             state["cross_document_validation"] = consistency_result
@@ -651,148 +954,101 @@ async def validate_cross_document_consistency(state: MarketingDocumentState) ->
     except Exception as e:
         return handle_node_error(state, e, "validate_cross_document_consistency")
 
-def create_docx_file(content: Dict[str, Any], title: str) -> bytes:
-    """Create a DOCX file from document content"""
-    
-    if not DOCX_AVAILABLE:
-        raise ImportError("python-docx is required for DOCX generation")
-    
-    doc = Document()
-    
-    # Add title
-    doc.add_heading(title, 0)
-    
-    # Add metadata
-    metadata = content.get("document_metadata", {})
-    if metadata:
-        doc.add_paragraph(f"Version: {metadata.get('version', '1.0')}")
-        doc.add_paragraph(f"Created: {metadata.get('created_date', datetime.utcnow().strftime('%Y-%m-%d'))}")
-        doc.add_paragraph(f"Target Audience: {metadata.get('target_audience', 'General')}")
-        doc.add_paragraph()
-    
-    # Add executive summary
-    if "executive_summary" in content:
-        doc.add_heading("Executive Summary", 1)
-        doc.add_paragraph(content["executive_summary"])
-        doc.add_paragraph()
-    
-    # Add main sections
-    sections = content.get("sections", [])
-    for section in sections:
-        doc.add_heading(section.get("section_title", "Section"), 1)
-        doc.add_paragraph(section.get("content", ""))
-        
-        # Add subsections
-        for subsection in section.get("subsections", []):
-            doc.add_heading(subsection.get("title", "Subsection"), 2)
-            doc.add_paragraph(subsection.get("content", ""))
-        
-        doc.add_paragraph()
-    
-    # Add key takeaways
-    if "key_takeaways" in content:
-        doc.add_heading("Key Takeaways", 1)
-        for takeaway in content["key_takeaways"]:
-            doc.add_paragraph(f"• {takeaway}", style='List Bullet')
-        doc.add_paragraph()
-    
-    # Add next steps
-    if "next_steps" in content:
-        doc.add_heading("Next Steps", 1)
-        for i, step in enumerate(content["next_steps"], 1):
-            doc.add_paragraph(f"{i}. {step}", style='List Number')
-        doc.add_paragraph()
-    
-    # Add appendices
-    for appendix in content.get("appendices", []):
-        doc.add_page_break()
-        doc.add_heading(appendix.get("title", "Appendix"), 1)
-        doc.add_paragraph(appendix.get("content", ""))
-    
-    # Save to bytes
-    docx_bytes = BytesIO()
-    doc.save(docx_bytes)
-    docx_bytes.seek(0)
-    
-    return docx_bytes.getvalue()
+# Rendered files by content digest; identical documents are linked instead of re-rendered
+# (shared by the DOC_EXECUTOR threads, so every access holds _render_cache_lock)
+_RENDER_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_render_cache_lock = threading.Lock()
+RENDER_CACHE_MAX_ENTRIES = 256
 
-def create_pdf_file(content: Dict[str, Any], title: str) -> bytes:
-    """Create a PDF file from document content"""
-    
-    if not PDF_AVAILABLE:
-        raise ImportError("reportlab is required for PDF generation")
-    
-    pdf_bytes = BytesIO()
-    doc = SimpleDocTemplate(pdf_bytes, pagesize=letter,
-                           rightMargin=72, leftMargin=72,
-                           topMargin=72, bottomMargin=18)
+def _render_digest(content: Dict[str, Any], title: str, format_type: str) -> str:
+    """BLAKE2b digest of everything that ends up in a rendered file"""
+    digest = hashlib.blake2b(f"{format_type}\0{title}\0".encode("utf-8"), digest_size=16)
+    digest.update(_dumpb(content, sort_keys=True))
+    return digest.hexdigest()
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """Hard-link src to dst, copying when links are not supported (e.g. across filesystems)"""
+    # Replace an existing dst like a fresh render would, unless it already is src
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+# Characters dropped from titles when building filenames (\w keeps non-ASCII letters, as str.isalnum did)
+_SAFE_TITLE_RE = re.compile(r"[^\w -]+")
+
+def _render_one(doc_plan: Dict[str, Any], content: Dict[str, Any], output_dir: str, timestamp: str) -> Dict[str, str]:
+    """Name, render and write one document's file (blocking - run on DOC_EXECUTOR)"""
     
-    styles = getSampleStyleSheet()
-    story = []
+    doc_id = doc_plan["document_id"]
+    title = doc_plan.get("title", f"Document {doc_id}")
+    format_type = doc_plan.get("format", "docx").lower()
     
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a1a1a'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    story.append(Paragraph(title, title_style))
-    story.append(Spacer(1, 12))
+    # Generate filename
+    safe_title = _SAFE_TITLE_RE.sub('', title).rstrip().replace(' ', '_')[:50]
     
-    # Metadata
-    metadata = content.get("document_metadata", {})
-    if metadata:
-        for key, value in metadata.items():
-            story.append(Paragraph(f"<b>{key.replace('_', ' ').title()}:</b> {value}", styles['Normal']))
-        story.append(Spacer(1, 12))
+    # Default to JSON for other formats
+    extension = format_type if format_type in ("docx", "pdf") else "json"
+    # Files in a batch share the timestamp, so the document id keeps colliding titles apart
+    safe_id = _SAFE_TITLE_RE.sub('', str(doc_id)).replace(' ', '_')
+    filename = f"{safe_title}_{safe_id}_{timestamp}.{extension}"
+    filepath = os.path.join(output_dir, filename)
     
-    # Executive Summary
-    if "executive_summary" in content:
-        story.append(Paragraph("Executive Summary", styles['Heading2']))
-        story.append(Paragraph(content["executive_summary"], styles['Normal']))
-        story.append(Spacer(1, 12))
-    
-    # Sections
-    for section in content.get("sections", []):
-        story.append(Paragraph(section.get("section_title", "Section"), styles['Heading2']))
-        story.append(Paragraph(section.get("content", ""), styles['Normal']))
-        story.append(Spacer(1, 6))
-        
-        for subsection in section.get("subsections", []):
-            story.append(Paragraph(subsection.get("title", "Subsection"), styles['Heading3']))
-            story.append(Paragraph(subsection.get("content", ""), styles['Normal']))
-            story.append(Spacer(1, 6))
-        
-        story.append(Spacer(1, 12))
+    digest = _render_digest(content, title, format_type)
+    with _render_cache_lock:
+        cached = _RENDER_CACHE.get(digest)
+        if cached:
+            _RENDER_CACHE.move_to_end(digest)
+    if cached and os.path.exists(cached):
+        if cached != filepath:
+            _link_or_copy(cached, filepath)
+    else:
+        pool = _get_render_pool()
+        if pool is None:
+            write_document_file(content, title, format_type, filepath)
+        else:
+            # This DOC_EXECUTOR thread just waits; the render itself runs in a worker process
+            pool.submit(write_document_file, content, title, format_type, filepath).result()
+        with _render_cache_lock:
+            _RENDER_CACHE[digest] = filepath
+            _RENDER_CACHE.move_to_end(digest)
+            if len(_RENDER_CACHE) > RENDER_CACHE_MAX_ENTRIES:
+                _RENDER_CACHE.popitem(last=False)
     
-    # Key Takeaways
-    if "key_takeaways" in content:
-        story.append(Paragraph("Key Takeaways", styles['Heading2']))
-        for takeaway in content["key_takeaways"]:
-            story.append(Paragraph(f"• {takeaway}", styles['Normal']))
-        story.append(Spacer(1, 12))
+    return {
+        "title": title,
+        "format": format_type,
+        "filename": filename,
+        "filepath": filepath,
+        "url": f"computer:///mnt/user-data/outputs/{filename}"
+    }
+
+async def persist_all(state: MarketingDocumentState) -> None:
+    """Upload every created file to blob storage concurrently and point the URLs at the blobs"""
     
-    # Next Steps
-    if "next_steps" in content:
-        story.append(Paragraph("Next Steps", styles['Heading2']))
-        for i, step in enumerate(content["next_steps"], 1):
-            story.append(Paragraph(f"{i}. {step}", styles['Normal']))
-        story.append(Spacer(1, 12))
+    if not storage_manager.blob_service_client:
+        return
     
-    # Appendices
-    for appendix in content.get("appendices", []):
-        story.append(PageBreak())
-        story.append(Paragraph(appendix.get("title", "Appendix"), styles['Heading2']))
-        story.append(Paragraph(appendix.get("content", ""), styles['Normal']))
+    manifest = state["document_manifest"]
+    results = await asyncio.gather(*(
+        storage_manager.upload_file_async(
+            f"marketing/{state.get('request_id', 'unknown')}/{item['filename']}",
+            state["document_files"][item["document_id"]],
+            {"document_id": item["document_id"], "format": item["format"]}
+        )
+        for item in manifest
+    ))
     
-    # Build PDF
-    doc.build(story)
-    pdf_bytes.seek(0)
+    # Files that failed to upload keep their local URL
+    for item, result in zip(manifest, results):
+        if result.get("success"):
+            item["url"] = result["url"]
     
-    return pdf_bytes.getvalue()
+    state["document_urls"] = [item["url"] for item in manifest]
 
 async def create_document_files(state: MarketingDocumentState) -> MarketingDocumentState:
     """Create actual document files (DOCX, PDF, etc.) and save to storage"""
@@ -804,7 +1060,10 @@ async def create_document_files(state: MarketingDocumentState) -> MarketingDocum
         
         state["status"] = "creating_files"
         state["current_stage"] = "file_generation"
-        state["updated_at"] = datetime.utcnow()
+        # One clock sample per node: every file in this batch shares the timestamp
+        now = datetime.utcnow()
+        state["updated_at"] = now
+        timestamp = now.strftime('%Y%m%d_%H%M%S')
         
         output_dir = "/mnt/user-data/outputs"
         os.makedirs(output_dir, exist_ok=True)
@@ -812,82 +1071,52 @@ async def create_document_files(state: MarketingDocumentState) -> MarketingDocum
         document_urls = []
         document_manifest = []
         
+        # Render every document concurrently on the render pool
+        renderable = []
         for doc_plan in state["document_plans"]:
+            content = state["document_contents"].get(doc_plan["document_id"], {})
+            if content and "error" not in content:
+                renderable.append((doc_plan, content))
+        
+        results = await asyncio.gather(
+            *(_run(_render_one, doc_plan, content, output_dir, timestamp) for doc_plan, content in renderable),
+            return_exceptions=True
+        )
+        
+        for (doc_plan, _), result in zip(renderable, results):
             doc_id = doc_plan["document_id"]
-            content = state["document_contents"].get(doc_id, {})
             
-            if not content or "error" in content:
+            if isinstance(result, Exception):
+                logger.error("Failed to create file for %s: %s", doc_id, result)
+                state["document_status"][doc_id] = DocumentStatus.FAILED
                 continue
             
-            title = doc_plan.get("title", f"Document {doc_id}")
-            format_type = doc_plan.get("format", "docx").lower()
+            # Store file info
+            state["document_files"][doc_id] = result["filepath"]
+            document_urls.append(result["url"])
             
-            # Generate filename
-            safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            safe_title = safe_title.replace(' ', '_')[:50]
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+            # Add to manifest
+            document_manifest.append({
+                "document_id": doc_id,
+                "title": result["title"],
+                "filename": result["filename"],
+                "format": result["format"],
+                "url": result["url"],
+                "quality_score": state["quality_scores"].get(doc_id, 0),
+                "validation_status": state["document_status"].get(doc_id, DocumentStatus.COMPLETED).value
+            })
             
-            try:
-                if format_type == "docx":
-                    # Create DOCX file
-                    filename = f"{safe_title}_{timestamp}.docx"
-                    filepath = os.path.join(output_dir, filename)
-                    
-                    docx_bytes = create_docx_file(content, title)
-                    with open(filepath, 'wb') as f:
-                        f.write(docx_bytes)
-                    
-                    url = f"computer:///mnt/user-data/outputs/{filename}"
-                    
-                elif format_type == "pdf":
-                    # Create PDF file
-                    filename = f"{safe_title}_{timestamp}.pdf"
-                    filepath = os.path.join(output_dir, filename)
-                    
-                    pdf_bytes = create_pdf_file(content, title)
-                    with open(filepath, 'wb') as f:
-                        f.write(pdf_bytes)
-                    
-                    url = f"computer:///mnt/user-data/outputs/{filename}"
-                    
-                else:
-                    # Default to JSON for other formats
-                    filename = f"{safe_title}_{timestamp}.json"
-                    filepath = os.path.join(output_dir, filename)
-                    
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        json.dump(content, f, indent=2, ensure_ascii=False)
-                    
-                    url = f"computer:///mnt/user-data/outputs/{filename}"
-                
-                # Store file info
-                state["document_files"][doc_id] = filepath
-                document_urls.append(url)
-                
-                # Add to manifest
-                document_manifest.append({
-                    "document_id": doc_id,
-                    "title": title,
-                    "filename": filename,
-                    "format": format_type,
-                    "url": url,
-                    "quality_score": state["quality_scores"].get(doc_id, 0),
-                    "validation_status": state["document_status"].get(doc_id, DocumentStatus.COMPLETED).value
-                })
-                
-                # Update status
-                state["document_status"][doc_id] = DocumentStatus.COMPLETED
-                
-                logger.info(f"Created file: {filename}")
-                
-            except Exception as e:
-                logger.error(f"Failed to create file for {doc_id}: {e}")
-                state["document_status"][doc_id] = DocumentStatus.FAILED
+            # Update status
+            state["document_status"][doc_id] = DocumentStatus.COMPLETED
+            
+            logger.info("Created file: %s", result["filename"])
         
         # Update state with URLs and manifest
         state["document_urls"] = document_urls
         state["document_manifest"] = document_manifest
         
+        await persist_all(state)
+        
         state["messages"].append(AIMessage(
             content=f"File creation complete: {len(document_urls)} documents saved."
         ))
@@ -907,12 +1136,15 @@ async def consolidate_final_deliverables(state: MarketingDocumentState) -> Marke
         
         state["status"] = "consolidating"
         state["current_stage"] = "final_consolidation"
-        state["updated_at"] = datetime.utcnow()
+        now = datetime.utcnow()
+        state["updated_at"] = now
         
         # Calculate overall metrics
         total_docs = len(state["document_plans"])
-        completed_docs = len([s for s in state["document_status"].values() if s == DocumentStatus.COMPLETED])
-        avg_quality = sum(state["quality_scores"].values()) / len(state["quality_scores"]) if state["quality_scores"] else 0
+        completed_docs = sum(1 for s in state["document_status"].values() if s == DocumentStatus.COMPLETED)
+        quality_scores = state["quality_scores"]
+        validation_results = state["validation_results"]
+        avg_quality, criteria_met = aggregate_scores(quality_scores, state["criteria_validation"])
         
         # Create executive summary
         executive_summary = {
@@ -920,7 +1152,7 @@ async def consolidate_final_deliverables(state: MarketingDocumentState) -> Marke
             "documents_delivered": f"{completed_docs}/{total_docs}",
             "average_quality_score": round(avg_quality, 2),
             "validation_status": state.get("overall_validation_status", ValidationStatus.NOT_VALIDATED).value,
-            "success_criteria_met": sum(state["criteria_validation"].values()),
+            "success_criteria_met": criteria_met,
             "total_success_criteria": len(state["success_criteria"]),
             "key_deliverables": [
                 {
@@ -936,23 +1168,23 @@ async def consolidate_final_deliverables(state: MarketingDocumentState) -> Marke
         final_deliverables = {
             "request_id": state.get("request_id"),
             "correlation_id": state.get("correlation_id"),
-            "completion_timestamp": datetime.utcnow().isoformat(),
+            "completion_timestamp": now.isoformat(),
             "executive_summary": executive_summary,
             "document_manifest": state["document_manifest"],
             "document_urls": state["document_urls"],
             "validation_summary": {
                 "individual_validation": {
                     doc_id: {
-                        "quality_score": state["quality_scores"].get(doc_id, 0),
-                        "issues_found": len(state["validation_results"].get(doc_id, {}).get("issues_found", []))
+                        "quality_score": quality_scores.get(doc_id, 0),
+                        "issues_found": len(validation_results.get(doc_id, _EMPTY).get("issues_found", ()))
                     }
-                    for doc_id in state["document_contents"].keys()
+                    for doc_id in state["document_contents"]
                 },
                 "cross_document_validation": state["cross_document_validation"]
             },
             "success_criteria_validation": state["criteria_validation"],
             "processing_metadata": {
-                "total_processing_time": (datetime.utcnow() - state.get("created_at", datetime.utcnow())).total_seconds(),
+                "total_processing_time": (now - state.get("created_at", now)).total_seconds(),
                 "documents_generated": completed_docs,
                 "validation_performed": state.get("overall_validation_status") != ValidationStatus.NOT_VALIDATED
             }
@@ -963,18 +1195,19 @@ async def consolidate_final_deliverables(state: MarketingDocumentState) -> Marke
         state["executive_summary"] = executive_summary
         
         # Calculate processing duration
+        finished = datetime.utcnow()
         if "created_at" in state:
-            state["processing_duration"] = (datetime.utcnow() - state["created_at"]).total_seconds()
+            state["processing_duration"] = (finished - state["created_at"]).total_seconds()
         
         state["status"] = "completed"
         state["current_stage"] = "delivery"
-        state["updated_at"] = datetime.utcnow()
+        state["updated_at"] = finished
         
         state["messages"].append(AIMessage(
             content=f"Project complete! Delivered {completed_docs} documents with average quality score of {avg_quality:.2f}."
         ))
         
-        logger.info(f"Final deliverables consolidated: {completed_docs}/{total_docs} documents delivered")
+        logger.info("Final deliverables consolidated: %d/%d documents delivered", completed_docs, total_docs)
         
         return state
         
@@ -0,0 +1,248 @@
+"""
+Document renderers for the Marketing Document Workflow
+Writes DOCX, PDF and JSON files; imports no LLM or storage clients, so render
+worker processes can load it cheaply by name however the workflow was loaded
+"""
+import sys
+from pathlib import Path
+
+# Add the src directory to Python path
+current_dir = Path(__file__).parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from typing import IO, Any, Dict, Optional, Union
+from datetime import datetime
+from xml.sax.saxutils import escape as _xml_escape
+from io import BytesIO
+import importlib.util
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# orjson is optional - fall back to the stdlib encoder when it is not installed
+try:
+    import orjson
+    
+    def _dumpb(obj: Any) -> bytes:
+        """Indented UTF-8 JSON bytes for files"""
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    def _dumpb(obj: Any) -> bytes:
+        """Indented UTF-8 JSON bytes for files"""
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=str).encode("utf-8")
+
+# Document libraries are imported on first use; only their presence is checked at load
+DOCX_AVAILABLE = importlib.util.find_spec("docx") is not None
+if not DOCX_AVAILABLE:
+    logger.warning("python-docx not installed. DOCX generation will be limited.")
+
+PDF_AVAILABLE = importlib.util.find_spec("reportlab") is not None
+if not PDF_AVAILABLE:
+    logger.warning("reportlab not installed. PDF generation will be limited.")
+
+_BASE_DOCX_BYTES: Optional[bytes] = None
+
+def _get_base_docx_bytes() -> bytes:
+    """Serialize the python-docx default template once; each DOCX is parsed from these bytes"""
+    global _BASE_DOCX_BYTES
+    if _BASE_DOCX_BYTES is None:
+        from docx import Document
+        buffer = BytesIO()
+        Document().save(buffer)
+        _BASE_DOCX_BYTES = buffer.getvalue()
+    return _BASE_DOCX_BYTES
+
+def create_docx_file(content: Dict[str, Any], title: str, output: Union[str, IO[bytes]]) -> None:
+    """Create a DOCX file from document content, saved straight to a path or binary stream"""
+    
+    if not DOCX_AVAILABLE:
+        raise ImportError("python-docx is required for DOCX generation")
+    
+    from docx import Document
+    
+    # A fresh parse per document: deep-copying a live Document shares its cached body proxy
+    doc = Document(BytesIO(_get_base_docx_bytes()))
+    
+    # Resolve list styles once per document rather than by name per paragraph
+    bullet_style = doc.styles['List Bullet']
+    number_style = doc.styles['List Number']
+    
+    # Add title
+    doc.add_heading(title, 0)
+    
+    # Add metadata
+    metadata = content.get("document_metadata", {})
+    if metadata:
+        doc.add_paragraph(f"Version: {metadata.get('version', '1.0')}")
+        doc.add_paragraph(f"Created: {metadata.get('created_date', datetime.utcnow().strftime('%Y-%m-%d'))}")
+        doc.add_paragraph(f"Target Audience: {metadata.get('target_audience', 'General')}")
+        doc.add_paragraph()
+    
+    # Add executive summary
+    if "executive_summary" in content:
+        doc.add_heading("Executive Summary", 1)
+        doc.add_paragraph(content["executive_summary"])
+        doc.add_paragraph()
+    
+    # Add main sections
+    sections = content.get("sections", [])
+    for section in sections:
+        doc.add_heading(section.get("section_title", "Section"), 1)
+        doc.add_paragraph(section.get("content", ""))
+        
+        # Add subsections
+        for subsection in section.get("subsections", []):
+            doc.add_heading(subsection.get("title", "Subsection"), 2)
+            doc.add_paragraph(subsection.get("content", ""))
+        
+        doc.add_paragraph()
+    
+    # Add key takeaways
+    if "key_takeaways" in content:
+        doc.add_heading("Key Takeaways", 1)
+        for takeaway in content["key_takeaways"]:
+            doc.add_paragraph(f"• {takeaway}", style=bullet_style)
+        doc.add_paragraph()
+    
+    # Add next steps
+    if "next_steps" in content:
+        doc.add_heading("Next Steps", 1)
+        for i, step in enumerate(content["next_steps"], 1):
+            doc.add_paragraph(f"{i}. {step}", style=number_style)
+        doc.add_paragraph()
+    
+    # Add appendices
+    for appendix in content.get("appendices", []):
+        doc.add_page_break()
+        doc.add_heading(appendix.get("title", "Appendix"), 1)
+        doc.add_paragraph(appendix.get("content", ""))
+    
+    doc.save(output)
+
+_pdf_styles = None
+
+def _get_pdf_styles():
+    """Build the ReportLab sample stylesheet and custom title style once; returns (styles, title_style)"""
+    global _pdf_styles
+    if _pdf_styles is None:
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1a1a1a'),
+            spaceAfter=30,
+            alignment=TA_CENTER
+        )
+        _pdf_styles = (styles, title_style)
+    return _pdf_styles
+
+def create_pdf_file(content: Dict[str, Any], title: str, output: Union[str, IO[bytes]]) -> None:
+    """Create a PDF file from document content, written straight to a path or binary stream"""
+    
+    if not PDF_AVAILABLE:
+        raise ImportError("reportlab is required for PDF generation")
+    
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+    
+    doc = SimpleDocTemplate(output, pagesize=letter,
+                           rightMargin=72, leftMargin=72,
+                           topMargin=72, bottomMargin=18,
+                           pageCompression=1)  # zlib page streams regardless of rl_config
+    
+    def _p(text: Any, style: ParagraphStyle) -> Paragraph:
+        """Paragraph from plain text, escaped so ReportLab's markup parser reads it in one pass"""
+        return Paragraph(_xml_escape(str(text)) if text else "", style)
+    
+    styles, title_style = _get_pdf_styles()
+    normal = styles['Normal']
+    h2 = styles['Heading2']
+    h3 = styles['Heading3']
+    story = []
+    
+    # Title
+    story.append(_p(title, title_style))
+    story.append(Spacer(1, 12))
+    
+    # Metadata
+    metadata = content.get("document_metadata", {})
+    if metadata:
+        story.extend(Paragraph(f"<b>{_xml_escape(key.replace('_', ' ').title())}:</b> {_xml_escape(str(value))}",
+                               normal)
+                     for key, value in metadata.items())
+        story.append(Spacer(1, 12))
+    
+    # Executive Summary
+    if "executive_summary" in content:
+        story.extend((_p("Executive Summary", h2),
+                      _p(content["executive_summary"], normal),
+                      Spacer(1, 12)))
+    
+    # Sections
+    story.extend(
+        flowable
+        for section in content.get("sections", [])
+        for flowable in (
+            [_p(section.get("section_title", "Section"), h2),
+             _p(section.get("content", ""), normal),
+             Spacer(1, 6)]
+            + [item
+               for subsection in section.get("subsections", [])
+               for item in (_p(subsection.get("title", "Subsection"), h3),
+                            _p(subsection.get("content", ""), normal),
+                            Spacer(1, 6))]
+            + [Spacer(1, 12)]
+        )
+    )
+    
+    # Key Takeaways
+    if "key_takeaways" in content:
+        story.append(_p("Key Takeaways", h2))
+        story.extend(_p(f"• {takeaway}", normal) for takeaway in content["key_takeaways"])
+        story.append(Spacer(1, 12))
+    
+    # Next Steps
+    if "next_steps" in content:
+        story.append(_p("Next Steps", h2))
+        story.extend(_p(f"{i}. {step}", normal)
+                     for i, step in enumerate(content["next_steps"], 1))
+        story.append(Spacer(1, 12))
+    
+    # Appendices
+    story.extend(
+        flowable
+        for appendix in content.get("appendices", [])
+        for flowable in (PageBreak(),
+                         _p(appendix.get("title", "Appendix"), h2),
+                         _p(appendix.get("content", ""), normal))
+    )
+    
+    # Build PDF
+    doc.build(story)
+
+def write_document_file(content: Dict[str, Any], title: str, format_type: str, filepath: str) -> None:
+    """Render one document and write it to filepath (blocking - run in a worker thread or process)"""
+    
+    try:
+        # A 1 MiB buffer turns the renderers' many small writes into a few large ones
+        with open(filepath, 'wb', buffering=1 << 20) as f:
+            if format_type == "docx":
+                create_docx_file(content, title, f)
+            elif format_type == "pdf":
+                create_pdf_file(content, title, f)
+            else:
+                # orjson already emits UTF-8 bytes, so skip the text layer entirely
+                f.write(_dumpb(content))
+    except Exception:
+        # Renderers now write in place, so drop any partial file
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
@@ -11,17 +11,24 @@ current_dir = Path(__file__).parent
 if str(current_dir) not in sys.path:
     sys.path.insert(0, str(current_dir))
 
-from typing import Dict, Any, Optional, List
+from typing import IO, Dict, Any, Optional, List, Tuple, Union
+import asyncio
 import logging
 import json
+import copy
 import uuid
+from collections import OrderedDict
+from itertools import islice
 from datetime import datetime, timedelta
 from config import config
+from artifact_writer import artifact_writer
 
 # Try to import Azure dependencies - optional for local development
 try:
-    from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
+    from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient, BlobType
     from azure.cosmos import CosmosClient, PartitionKey, exceptions
+    from azure.core.pipeline.transport import RequestsTransport
+    import requests
     AZURE_AVAILABLE = True
 except ImportError:
     logger = logging.getLogger(__name__)
@@ -34,6 +41,57 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# orjson is optional - fall back to the stdlib encoder when it is not installed
+try:
+    import orjson
+    
+    def _dumpb(obj: Any) -> bytes:
+        """Compact UTF-8 JSON bytes for blob payloads"""
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    def _dumpb(obj: Any) -> bytes:
+        """Compact UTF-8 JSON bytes for blob payloads"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+# Cosmos DB transactional batches accept at most 100 operations and 2 MB of payload
+# (the byte cap leaves headroom for the batch request envelope)
+COSMOS_BATCH_LIMIT = 100
+COSMOS_BATCH_MAX_BYTES = 1_900_000
+
+# Parallel block uploads per blob; large payloads are staged in blocks instead of one PUT
+BLOB_UPLOAD_CONCURRENCY = 4
+BLOB_MAX_BLOCK_SIZE = 4 * 1024 * 1024
+BLOB_MAX_SINGLE_PUT_SIZE = 16 * 1024 * 1024
+
+# Kept-alive HTTPS connections shared by every blob operation
+BLOB_CONNECTION_POOL_SIZE = 32
+BLOB_CONNECTION_TIMEOUT = 5
+BLOB_READ_TIMEOUT = 30
+
+# Records kept for conditional (If-None-Match) re-reads
+COSMOS_READ_CACHE_MAX_ENTRIES = 1024
+
+# Summary projection - full records carry the risk analysis and gap lists. The single-property
+# ORDER BY is served by the default range index, so no custom indexing policy is needed.
+USER_ASSESSMENTS_QUERY = (
+    "SELECT TOP @limit c.id, c.document_type, c.assessment_summary, c.document_metadata, c.timestamps "
+    "FROM c WHERE c.metadata.user_id = @user_id ORDER BY c.timestamps.created DESC"
+)
+
+def _build_blob_transport() -> "RequestsTransport":
+    """HTTP transport with a pooled keep-alive session, so uploads reuse TLS connections"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=BLOB_CONNECTION_POOL_SIZE,
+        pool_maxsize=BLOB_CONNECTION_POOL_SIZE
+    )
+    session.mount("https://", adapter)
+    return RequestsTransport(
+        session=session,
+        connection_timeout=BLOB_CONNECTION_TIMEOUT,
+        read_timeout=BLOB_READ_TIMEOUT
+    )
+
 class ComplianceStorageManager:
     """Manages Azure Blob Storage for compliance documents"""
     
@@ -46,7 +104,12 @@ class ComplianceStorageManager:
             self.blob_service_client = None
         elif self.connection_string:
             try:
-                self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
+                self.blob_service_client = BlobServiceClient.from_connection_string(
+                    self.connection_string,
+                    transport=_build_blob_transport(),
+                    max_block_size=BLOB_MAX_BLOCK_SIZE,
+                    max_single_put_size=BLOB_MAX_SINGLE_PUT_SIZE
+                )
                 self._initialize_container()
             except Exception as e:
                 logger.error(f"Failed to initialize Blob Storage: {e}")
@@ -70,12 +133,20 @@ class ComplianceStorageManager:
     
     async def upload_document(
         self,
-        document_content: str,
+        document_content: Union[Dict[str, Any], str, bytes, IO[bytes]],
         document_type: str,
         document_id: str,
-        metadata: Dict[str, str] = None
+        metadata: Dict[str, str] = None,
+        buffered: bool = False
     ) -> Dict[str, Any]:
-        """Upload compliance document to blob storage"""
+        """Upload compliance document to blob storage
+        
+        buffered uploads are queued on the background artifact writer and
+        return at once with the pending upload under "write"; pass it to
+        artifact_writer.flush() before relying on the blob.
+        Dicts are serialized to JSON here; pass an open binary file for large
+        payloads so the SDK streams it in blocks.
+        """
         if not self.blob_service_client:
             return {"success": False, "error": "Blob storage not configured"}
             
@@ -96,15 +167,32 @@ class ComplianceStorageManager:
             blob_metadata['document_type'] = document_type
             blob_metadata['document_id'] = document_id
             
-            # Upload document
-            blob_client.upload_blob(
-                document_content,
-                overwrite=True,
-                metadata=blob_metadata
-            )
+            # Serialize or encode once; bytes and streams go to the SDK as-is
+            if isinstance(document_content, dict):
+                data = _dumpb(document_content)
+            elif isinstance(document_content, str):
+                data = document_content.encode("utf-8")
+            else:
+                data = document_content
+            upload_kwargs = {
+                "overwrite": True,
+                "metadata": blob_metadata,
+                "blob_type": BlobType.BLOCKBLOB,
+                "max_concurrency": BLOB_UPLOAD_CONCURRENCY,
+                "length": len(data) if isinstance(data, bytes) else None
+            }
+            
+            # Upload document (the SDK call blocks, so keep it off the event loop)
+            write = None
+            if buffered:
+                write = artifact_writer.submit(blob_client.upload_blob, data, **upload_kwargs)
+            else:
+                await asyncio.to_thread(blob_client.upload_blob, data, **upload_kwargs)
             
             return {
                 "success": True,
+                "queued": buffered,
+                "write": write,
                 "blob_name": blob_name,
                 "url": blob_client.url,
                 "container": self.container_name,
@@ -118,6 +206,55 @@ class ComplianceStorageManager:
                 "error": str(e)
             }
     
+    async def upload_file_async(
+        self,
+        blob_name: str,
+        file_path: str,
+        metadata: Dict[str, str] = None
+    ) -> Dict[str, Any]:
+        """Upload a local file to blob storage without blocking the event loop"""
+        if not self.blob_service_client:
+            return {"success": False, "error": "Blob storage not configured"}
+            
+        try:
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.container_name,
+                blob=blob_name
+            )
+            
+            blob_metadata = dict(metadata or {})
+            blob_metadata['upload_timestamp'] = datetime.utcnow().isoformat()
+            
+            await asyncio.to_thread(self._upload_file, blob_client, file_path, blob_metadata)
+            
+            return {
+                "success": True,
+                "blob_name": blob_name,
+                "url": blob_client.url,
+                "container": self.container_name,
+                "metadata": blob_metadata
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to upload file {file_path}: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    @staticmethod
+    def _upload_file(blob_client, file_path: str, metadata: Dict[str, str]):
+        """Stream a file into a blob (blocking)"""
+        with open(file_path, 'rb') as f:
+            blob_client.upload_blob(
+                f,
+                overwrite=True,
+                metadata=metadata,
+                blob_type=BlobType.BLOCKBLOB,
+                max_concurrency=BLOB_UPLOAD_CONCURRENCY,
+                length=os.fstat(f.fileno()).st_size
+            )
+    
     async def download_document(
         self,
         blob_name: str
@@ -149,6 +286,7 @@ class ComplianceCosmosManager:
         self.key = os.getenv("COSMOS_KEY")
         self.database_name = os.getenv("COSMOS_DATABASE_NAME")
         self.container_name = os.getenv("COSMOS_CONTAINER_NAME")
+        self._read_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
         
         if not AZURE_AVAILABLE:
             logger.info("Azure Cosmos SDK not available - running in local development mode")
@@ -187,56 +325,94 @@ class ComplianceCosmosManager:
             logger.error(f"Failed to initialize Cosmos DB: {e}")
             self.container = None
     
+    @staticmethod
+    def _build_compliance_record(
+        document_id: str,
+        document_type: str,
+        assessment_results: Dict[str, Any],
+        document_content: Dict[str, Any],
+        metadata: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """Shape an assessment into the Cosmos DB record stored per document"""
+        # Look each subtree up once and reuse it across the record
+        metadata = metadata or {}
+        risk_analysis = assessment_results.get("risk_analysis") or {}
+        gaps = assessment_results.get("compliance_gaps") or ()
+        now = datetime.utcnow()
+        created = now.isoformat()
+        
+        return {
+            "id": document_id,
+            "document_type": document_type,
+            "assessment_summary": {
+                "compliance_category": assessment_results.get("compliance_category"),
+                "frameworks": assessment_results.get("identified_frameworks", []),
+                "risk_level": risk_analysis.get("overall_risk_level"),
+                "compliance_score": assessment_results.get("compliance_score"),
+                "gaps_count": len(gaps)
+            },
+            "document_metadata": {
+                "title": document_content.get("title"),
+                "sections_count": len(document_content.get("sections", [])),
+                "recommendations_count": len(assessment_results.get("control_recommendations", []))
+            },
+            "risk_analysis": risk_analysis,
+            "compliance_gaps": list(islice(gaps, 10)),  # Top 10 gaps
+            "metadata": {
+                **metadata,
+                "created_at": created,
+                "request_id": metadata.get("request_id"),
+                "user_id": metadata.get("user_id")
+            },
+            "storage_reference": metadata.get("blob_url"),
+            "timestamps": {
+                "created": created,
+                "expires": (now + timedelta(days=90)).isoformat()
+            }
+        }
+    
     async def save_compliance_record(
         self,
         document_id: str,
         document_type: str,
         assessment_results: Dict[str, Any],
         document_content: Dict[str, Any],
-        metadata: Dict[str, Any] = None
+        metadata: Dict[str, Any] = None,
+        buffered: bool = False
     ) -> Dict[str, Any]:
-        """Save compliance assessment record to Cosmos DB"""
+        """Save compliance assessment record to Cosmos DB
+        
+        buffered records are queued on the background artifact writer and the
+        document_id is returned as a provisional record id, with the pending
+        insert under "write" for artifact_writer.flush().
+        """
         if not self.container:
             return {"success": False, "error": "Cosmos DB not configured"}
             
         try:
-            record = {
-                "id": document_id,
-                "document_type": document_type,
-                "assessment_summary": {
-                    "compliance_category": assessment_results.get("compliance_category"),
-                    "frameworks": assessment_results.get("identified_frameworks", []),
-                    "risk_level": assessment_results.get("risk_analysis", {}).get("overall_risk_level"),
-                    "compliance_score": assessment_results.get("compliance_score"),
-                    "gaps_count": len(assessment_results.get("compliance_gaps", []))
-                },
-                "document_metadata": {
-                    "title": document_content.get("title"),
-                    "sections_count": len(document_content.get("sections", [])),
-                    "recommendations_count": len(assessment_results.get("control_recommendations", []))
-                },
-                "risk_analysis": assessment_results.get("risk_analysis", {}),
-                "compliance_gaps": assessment_results.get("compliance_gaps", [])[:10],  # Top 10 gaps
-                "metadata": {
-                    **(metadata or {}),
-                    "created_at": datetime.utcnow().isoformat(),
-                    "request_id": metadata.get("request_id") if metadata else None,
-                    "user_id": metadata.get("user_id") if metadata else None
-                },
-                "storage_reference": metadata.get("blob_url") if metadata else None,
-                "timestamps": {
-                    "created": datetime.utcnow().isoformat(),
-                    "expires": (datetime.utcnow() + timedelta(days=90)).isoformat()
+            record = self._build_compliance_record(
+                document_id, document_type, assessment_results, document_content, metadata
+            )
+            
+            if buffered:
+                write = artifact_writer.submit(self.container.create_item, body=record)
+                logger.info(f"Queued compliance record: {document_id}")
+                return {
+                    "success": True,
+                    "queued": True,
+                    "write": write,
+                    "record_id": document_id,
+                    "document_type": document_type
                 }
-            }
             
-            # Create item in Cosmos DB
-            created_item = self.container.create_item(body=record)
+            # Create item in Cosmos DB (the SDK call blocks, so keep it off the event loop)
+            created_item = await asyncio.to_thread(self.container.create_item, body=record)
             
             logger.info(f"Saved compliance record: {document_id}")
             
             return {
                 "success": True,
+                "queued": False,
                 "record_id": created_item["id"],
                 "document_type": document_type
             }
@@ -248,48 +424,173 @@ class ComplianceCosmosManager:
                 "error": str(e)
             }
     
+    @staticmethod
+    def _split_batches(records: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split one partition's records into batches within the operation and payload caps"""
+        batches: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_bytes = 0
+        for record in records:
+            size = len(_dumpb(record))
+            if current and (len(current) >= COSMOS_BATCH_LIMIT or current_bytes + size > COSMOS_BATCH_MAX_BYTES):
+                batches.append(current)
+                current, current_bytes = [], 0
+            current.append(record)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
+    
+    async def _save_batch(self, document_type: str, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Write one transactional batch, falling back to per-item upserts if Cosmos rejects it"""
+        try:
+            await asyncio.to_thread(
+                self.container.execute_item_batch,
+                [("create", (record,)) for record in batch],
+                partition_key=document_type
+            )
+            return {"saved": [record["id"] for record in batch], "errors": []}
+        except Exception as e:
+            logger.warning(f"Batch of {len(batch)} compliance records for {document_type} rejected ({e}); saving individually")
+        
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.container.upsert_item, body=record) for record in batch),
+            return_exceptions=True
+        )
+        saved, errors = [], []
+        for record, result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to save compliance record {record['id']}: {result}")
+                errors.append({"record_id": record["id"], "document_type": document_type, "error": str(result)})
+            else:
+                saved.append(record["id"])
+        return {"saved": saved, "errors": errors}
+    
+    async def save_compliance_records_bulk(
+        self,
+        records: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Save many compliance records using transactional batches per partition
+        
+        Each item carries the save_compliance_record arguments (document_id,
+        document_type, assessment_results, document_content, metadata). Records
+        sharing a document_type are batched within COSMOS_BATCH_LIMIT operations
+        and COSMOS_BATCH_MAX_BYTES of payload, and all batches are submitted
+        concurrently; a rejected batch is retried as individual upserts.
+        """
+        if not self.container:
+            return {"success": False, "error": "Cosmos DB not configured"}
+        
+        # Group by partition key - a transactional batch cannot span partitions
+        by_partition: Dict[str, List[Dict[str, Any]]] = {}
+        for item in records:
+            record = self._build_compliance_record(
+                item["document_id"],
+                item["document_type"],
+                item.get("assessment_results", {}),
+                item.get("document_content", {}),
+                item.get("metadata")
+            )
+            by_partition.setdefault(item["document_type"], []).append(record)
+        
+        batches = [
+            (document_type, batch)
+            for document_type, group in by_partition.items()
+            for batch in self._split_batches(group)
+        ]
+        results = await asyncio.gather(
+            *(self._save_batch(document_type, batch) for document_type, batch in batches)
+        )
+        
+        saved_ids = [record_id for result in results for record_id in result["saved"]]
+        errors = [error for result in results for error in result["errors"]]
+        
+        logger.info(f"Saved {len(saved_ids)}/{len(records)} compliance records in {len(batches)} batch(es)")
+        
+        return {
+            "success": not errors,
+            "record_ids": saved_ids,
+            "errors": errors
+        }
+    
     async def get_compliance_record(
         self,
         document_id: str,
         document_type: str
     ) -> Optional[Dict[str, Any]]:
-        """Retrieve compliance record from Cosmos DB"""
+        """Retrieve compliance record from Cosmos DB
+        
+        Repeat reads send the cached ETag; an unchanged record comes back as a
+        bodiless 304 and the cached copy is returned.
+        """
         if not self.container:
             return None
+        
+        key = (document_id, document_type)
+        cached = self._read_cache.get(key)
+        headers = {"If-None-Match": cached["_etag"]} if cached else None
             
         try:
-            item = self.container.read_item(
+            item = await asyncio.to_thread(
+                self.container.read_item,
                 item=document_id,
-                partition_key=document_type
+                partition_key=document_type,
+                initial_headers=headers
             )
-            return item
         except exceptions.CosmosResourceNotFoundError:
+            self._read_cache.pop(key, None)
             logger.warning(f"Compliance record not found: {document_id}")
             return None
         except Exception as e:
             logger.error(f"Failed to retrieve compliance record: {e}")
             return None
+        
+        # 304 Not Modified has no body; callers get copies so they cannot alter the cache
+        if cached and not item:
+            self._read_cache.move_to_end(key)
+            return copy.deepcopy(cached)
+        
+        if item.get("_etag"):
+            self._read_cache[key] = copy.deepcopy(item)
+            self._read_cache.move_to_end(key)
+            if len(self._read_cache) > COSMOS_READ_CACHE_MAX_ENTRIES:
+                self._read_cache.popitem(last=False)
+        return item
     
     async def query_user_assessments(
         self,
         user_id: str,
-        limit: int = 50
+        limit: int = 50,
+        document_type: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Query all compliance assessments for a user"""
+        """Query assessment summaries for a user, newest first
+        
+        Passing document_type scopes the query to that partition; otherwise it fans out
+        across partitions, since records are partitioned by document type, not user.
+        """
         if not self.container:
             return []
             
         try:
-            query = "SELECT * FROM c WHERE c.metadata.user_id = @user_id ORDER BY c.timestamps.created DESC"
-            parameters = [{"name": "@user_id", "value": user_id}]
+            parameters = [
+                {"name": "@user_id", "value": user_id},
+                {"name": "@limit", "value": limit}
+            ]
+            if document_type:
+                scope = {"partition_key": document_type}
+            else:
+                scope = {"enable_cross_partition_query": True}
             
-            items = list(self.container.query_items(
-                query=query,
-                parameters=parameters,
-                max_item_count=limit
-            ))
+            def _query() -> List[Dict[str, Any]]:
+                return list(self.container.query_items(
+                    query=USER_ASSESSMENTS_QUERY,
+                    parameters=parameters,
+                    max_item_count=limit,
+                    **scope
+                ))
             
-            return items
+            # Paging through results blocks, so keep it off the event loop
+            return await asyncio.to_thread(_query)
             
         except Exception as e:
             logger.error(f"Failed to query user assessments: {e}")